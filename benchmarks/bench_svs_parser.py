@@ -0,0 +1,52 @@
+"""Пропускная способность разбора файлов ходов на больших синтетических ходах.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_svs_parser
+"""
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_turn_bytes
+from src.visualizer.file_handler import FileHandler
+from src.visualizer.svs_parser import parse_svs
+
+# (игроков, объектов на игрока)
+SIZES = [(20, 50), (50, 200), (50, 1000)]
+REPEAT = 5
+
+
+def best_time(func, repeat=REPEAT):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    print(f"{'игроков':>8} {'объектов':>9} {'КБ':>8} {'parse_svs, мс':>14} {'МБ/с':>7} "
+          f"{'объектов/с':>11} {'FileHandler, мс':>16}")
+    handler = FileHandler()
+    for players, per_player in SIZES:
+        for encoding in ('cp1251', 'cp866'):
+            content = make_turn_bytes(1, players, per_player, 500, 500, encoding=encoding)
+            objects = players * per_player
+            parse_time = best_time(lambda: parse_svs(content))
+
+            with tempfile.NamedTemporaryFile(suffix='.svs', delete=False) as file:
+                file.write(content)
+            try:
+                handler_time = best_time(lambda: handler.load_turn_file(file.name))
+            finally:
+                os.unlink(file.name)
+
+            print(f"{players:>8} {objects:>9} {len(content) / 1024:>8.0f} {parse_time * 1000:>14.2f} "
+                  f"{len(content) / parse_time / 1e6:>7.1f} {objects / parse_time:>11.0f} "
+                  f"{handler_time * 1000:>16.2f}  {encoding}")
+
+
+if __name__ == '__main__':
+    main()
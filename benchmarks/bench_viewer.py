@@ -0,0 +1,156 @@
+"""Замеры горячих путей просмотрщика на синтетических играх разного размера.
+
+Для каждого размера генерируется игра (ANT.DAT, MAP.BMP, ходы) и замеряются:
+запуск просмотрщика, поиск рамки поля, разбор хода (load_turn_data без кэша и
+с кэшем, FileHandler.load_turn_file), отрисовка объектов хода, подсветка
+клетки с подсказкой и смена хода. Окно не открывается (SDL dummy).
+Результаты пишутся в JSON, чтобы сравнивать прогоны между собой.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_viewer [-s small large] [-o bench_results.json]
+"""
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import pygame
+
+from benchmarks.synthetic import make_game
+from show import MapVisualizer
+from src.visualizer.diagnostics import setup_logging
+from src.visualizer.file_handler import FileHandler
+
+# имя -> (ширина, высота, игроков, объектов на игрока, ходов)
+SIZES = {
+    'small': (55, 38, 10, 100, 3),
+    'medium': (200, 200, 30, 500, 3),
+    'large': (500, 500, 50, 1000, 3),
+}
+REPEAT = 5
+
+
+def measure(func, repeat=REPEAT, setup=None):
+    """Лучшее и среднее время вызова в миллисекундах"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return {'best_ms': round(min(times), 3), 'mean_ms': round(sum(times) / len(times), 3)}
+
+
+def busiest_cell(viewer, objects):
+    """Клетка с наибольшим числом объектов - самая дорогая подсказка"""
+    counts = {}
+    for obj in objects:
+        counts[(obj[1], obj[2])] = counts.get((obj[1], obj[2]), 0) + 1
+    return max(counts, key=counts.get) if counts else (1, 1)
+
+
+def bench_size(name, game_dir, repeat):
+    width, height, players, per_player, turns = SIZES[name]
+    result = {'map': [width, height], 'players': players,
+              'objects_per_turn': players * per_player, 'turns': turns}
+
+    started = time.perf_counter()
+    viewer = MapVisualizer(game_dir=game_dir)
+    result['startup_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    # Фоновая подгрузка исказила бы замеры разбора и смены хода
+    viewer.prefetcher.radius = 0
+    viewer.prefetcher.invalidate()
+    viewer.history_builder.stop()
+    viewer.history.truncate(0)
+
+    result['find_game_borders'] = measure(viewer.find_game_borders, repeat)
+
+    def drop_caches():
+        viewer.prefetcher.invalidate()
+        viewer.turn_cache.clear()
+        shutil.rmtree(viewer.turn_cache.cache_dir, ignore_errors=True)
+
+    result['load_turn_data_cold'] = measure(lambda: viewer.load_turn_data(1), repeat, drop_caches)
+    result['load_turn_data_cached'] = measure(lambda: viewer.load_turn_data(1), repeat,
+                                              viewer.prefetcher.invalidate)
+
+    handler = FileHandler()
+    turn_file = viewer.find_turn_file(1)
+    result['file_handler_load_turn_file'] = measure(
+        lambda: handler.load_turn_file(turn_file), repeat)
+
+    objects = viewer.load_turn_data(1)
+    viewer.current_turn = 1
+    viewer.current_turn_objects = objects
+    surface = pygame.Surface(viewer.scaled_canvas.get_size())
+    result['draw_canvas'] = measure(lambda: viewer.draw_canvas(surface), repeat)
+    result['draw_game_objects'] = measure(lambda: viewer.draw_game_objects(objects, surface), repeat)
+
+    # Кадр с курсором над самой населенной клеткой: подсветка и подсказка
+    viewer.render_frame(True)
+    hover_pos = viewer.cell_screen_rect(*busiest_cell(viewer, objects)).center
+    result['draw_cell_highlight'] = measure(lambda: viewer.draw_cell_highlight(hover_pos), repeat)
+
+    def switch_turns():
+        for turn in range(turns):
+            viewer.current_turn = turn
+            viewer.current_turn_objects = viewer.load_turn_data(turn)
+            viewer.render_frame(False)
+
+    switch = measure(switch_turns, repeat, viewer.prefetcher.invalidate)
+    result['turn_switch'] = {key: round(value / turns, 3) for key, value in switch.items()}
+
+    viewer.prefetcher.shutdown()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры просмотрщика на синтетических играх")
+    parser.add_argument('-s', '--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT)
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    assets_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report = {
+        'python': sys.version.split()[0],
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': {},
+    }
+    workdir = tempfile.mkdtemp(prefix='vs25_bench_')
+    try:
+        for name in args.sizes:
+            width, height, players, per_player, turns = SIZES[name]
+            game_dir = make_game(os.path.join(workdir, name), width, height, players,
+                                 per_player, turns, assets_dir=assets_dir)
+            result = bench_size(name, game_dir, args.repeat)
+            report['results'][name] = result
+            print(f"{name:>7}: запуск {result['startup_ms']:.0f} мс, "
+                  f"рамка {result['find_game_borders']['best_ms']:.1f} мс, "
+                  f"разбор {result['load_turn_data_cold']['best_ms']:.1f} мс, "
+                  f"объекты {result['draw_game_objects']['best_ms']:.1f} мс, "
+                  f"подсказка {result['draw_cell_highlight']['best_ms']:.2f} мс, "
+                  f"смена хода {result['turn_switch']['best_ms']:.1f} мс")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        pygame.quit()
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
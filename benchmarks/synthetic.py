@@ -0,0 +1,104 @@
+"""Генератор синтетических игр для замеров производительности"""
+import os
+import random
+
+LEGEND = ('л-Личное войско,г-Гном,в-Варвар,э-Эльф,о-Орк,п-Пехота,р-Рыцарь,м-Маг,з-Зомби,'
+          'д-Дракон,ф-Корабль,К-Крепость,Г-Город,З-Замок,П-Поместье,Б-Башня,'
+          'C-Медь,S-Серебро,G-Золото,M-Мифрил,')
+ARMY_TYPES = 'гвэопрмздф'
+BUILDING_TYPES = 'КГЗПБCSGM'
+STATES = (0, 32, 64, 96, 128, 160, 192, 224)
+
+
+def make_turn_text(turn, players, objects_per_player, map_width, map_height, seed=0):
+    """Текст файла хода: players игроков по objects_per_player объектов"""
+    rng = random.Random(seed * 1000003 + turn)
+    lines = [LEGEND, str(turn)]
+    for number in range(players):
+        lines.append('Player')
+        lines.append(f'Игрок {number} (Контакт "p{number}") Страна {number}')
+        lines.append(f'{rng.randint(0, 30)} {rng.randint(0, 500)} {rng.randint(0, 0xFFFFFF)}')
+        for _ in range(objects_per_player):
+            kind = ARMY_TYPES if rng.random() < 0.6 else BUILDING_TYPES
+            lines.append(f'{rng.choice(kind)} {rng.randint(1, map_width)} '
+                         f'{rng.randint(1, map_height)} {rng.choice(STATES)},')
+    lines.append('END')
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def make_turn_bytes(turn, players, objects_per_player, map_width, map_height,
+                    seed=0, encoding='cp1251'):
+    return make_turn_text(turn, players, objects_per_player,
+                          map_width, map_height, seed).encode(encoding)
+
+
+def make_ant_dat(map_width, map_height, regions=26, mines_per_type=20, seed=0):
+    """ANT.DAT: прямоугольные регионы, морская кайма, рудники и таблица регионов"""
+    rng = random.Random(seed)
+    codes = [chr(ord('A') + i) for i in range(26)] + [chr(ord('a') + i) for i in range(26)]
+    codes = codes[:max(1, min(regions, len(codes)))]
+    side = max(1, round(len(codes) ** 0.5))
+    lines = ['[synthetic]', str(map_width), str(map_height), '[Land]']
+    for y in range(map_height):
+        row = []
+        for x in range(map_width):
+            if x in (0, map_width - 1) or y in (0, map_height - 1):
+                row.append('.')
+            else:
+                block = (y * side // map_height) * side + x * side // map_width
+                row.append(codes[block % len(codes)])
+        lines.append(''.join(row))
+    for metal in range(1, 5):
+        pairs = [f'{rng.randint(1, map_width)} {rng.randint(1, map_height)}'
+                 for _ in range(mines_per_type)]
+        lines.append(f'{metal} ' + ','.join(pairs))
+    lines.append(str(len(codes)))
+    for number, code in enumerate(codes):
+        lines.extend([code, f'Регион {number}', str(rng.randint(1, 15))])
+    lines.extend(['.', 'море', '0'])
+    return ('\r\n'.join(lines) + '\r\n').encode('cp1251')
+
+
+def make_map_bmp(path, map_width, map_height, pitch, margin=24):
+    """MAP.BMP с полосатой черно-белой линейкой рамки по числу клеток"""
+    import numpy as np
+    import pygame
+
+    width = map_width * pitch + margin * 2
+    height = map_height * pitch + margin * 2
+    pixels = np.empty((width, height, 3), dtype=np.uint8)
+    pixels[:] = (128, 128, 128)
+    pixels[margin:width - margin, margin:height - margin] = (110, 160, 90)
+
+    band = 4
+    stripes_x = ((np.arange(width - margin * 2) // pitch) % 2 * 255).astype(np.uint8)
+    stripes_y = ((np.arange(height - margin * 2) // pitch) % 2 * 255).astype(np.uint8)
+    for side in (margin - band, height - margin):
+        pixels[margin:width - margin, side:side + band] = stripes_x[:, None, None]
+    for side in (margin - band, width - margin):
+        pixels[side:side + band, margin:height - margin] = stripes_y[None, :, None]
+
+    surface = pygame.Surface((width, height))
+    pygame.surfarray.blit_array(surface, pixels)
+    pygame.image.save(surface, path)
+
+
+def make_game(directory, map_width, map_height, players, objects_per_player,
+              turns, seed=0, pitch=None, assets_dir='.'):
+    """Директория игры: ANT.DAT, MAP.BMP, пиктограммы и файлы ходов Год0..ГодN"""
+    import shutil
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'ANT.DAT'), 'wb') as file:
+        file.write(make_ant_dat(map_width, map_height, seed=seed))
+    if pitch is None:
+        # Картинка не больше ~2000 пикселей по большей стороне
+        pitch = max(3, min(20, 2000 // max(map_width, map_height)))
+    make_map_bmp(os.path.join(directory, 'MAP.BMP'), map_width, map_height, pitch)
+    for name in ('OSNOVA.BMP', 'RUDNICI.BMP'):
+        shutil.copy(os.path.join(assets_dir, name), os.path.join(directory, name))
+    for turn in range(turns):
+        with open(os.path.join(directory, f'Год{turn}.svs'), 'wb') as file:
+            file.write(make_turn_bytes(turn, players, objects_per_player,
+                                       map_width, map_height, seed))
+    return directory
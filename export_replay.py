@@ -0,0 +1,48 @@
+"""Выгрузка всей игры в один файл повтора.
+
+Ходы разбираются один раз (через кэш ходов, как в просмотрщике), войска
+сопоставляются, и вместе с файлами карты все пишется в файл, который
+просмотрщик открывает без разбора .svs:
+
+    python export_replay.py [директория игры] -o game.vs25r
+    python show.py --replay game.vs25r
+"""
+import os
+
+# Окно не нужно: SDL рисует в память
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import time
+
+import pygame
+
+from show import MapVisualizer
+from src.visualizer.diagnostics import setup_logging
+from src.visualizer.replay import GAME_FILES, KEYFRAME_INTERVAL, write_replay
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка игры в файл повтора")
+    parser.add_argument('game_dir', nargs='?', default=None,
+                        help="директория с ANT.DAT (по умолчанию ищется как в просмотрщике)")
+    parser.add_argument('-o', '--output', default='game.vs25r', help="файл повтора")
+    parser.add_argument('--keyframes', type=int, default=KEYFRAME_INTERVAL,
+                        help="интервал опорных ходов")
+    parser.add_argument('-v', '--verbose', action='store_true', help="подробный журнал")
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+
+    started = time.perf_counter()
+    viewer = MapVisualizer(game_dir=args.game_dir, watch=False)
+    viewer.prefetcher.shutdown()
+    viewer.history_builder.wait()
+    files = {name: viewer.find_file(name) for name in GAME_FILES}
+    write_replay(args.output, viewer.history, viewer.game.title, files, args.keyframes)
+    pygame.quit()
+    print(f"Ходов: {len(viewer.history)}, {os.path.getsize(args.output) // 1024} КБ "
+          f"в {args.output} за {time.perf_counter() - started:.2f} с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Пакетная отрисовка всех ходов игры в PNG без окна.
+
+Карта, границы поля и пиктограммы готовятся один раз в главном процессе;
+пиксели канвы передаются процессам-отрисовщикам через общую память.
+
+    python render_turns.py [директория игры] -o turns_png -j 8 --width 1600
+"""
+import os
+
+# Окно не нужно: SDL рисует в память
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import pygame
+
+from show import MapVisualizer
+from src.visualizer.diagnostics import setup_logging
+
+# Состояние процесса-отрисовщика
+_worker = None
+
+
+def init_worker(state, shm_name, width, output_dir):
+    """Подключается к общей канве и готовит отрисовщик ходов"""
+    global _worker
+    pygame.init()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    canvas = pygame.image.frombuffer(shm.buf, state['canvas_size'], 'RGB')
+    renderer = MapVisualizer.from_render_state(state, canvas, width)
+    # Ссылка на общую память должна жить, пока жива канва
+    _worker = (renderer, shm, output_dir)
+
+
+def render_turn(turn):
+    renderer, _, output_dir = _worker
+    surface = renderer.render_turn_surface(turn)
+    if surface is None:
+        return turn, None
+    path = os.path.join(output_dir, f'turn_{turn:03d}.png')
+    pygame.image.save(surface, path)
+    return turn, path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отрисовка всех ходов игры в PNG без окна")
+    parser.add_argument('game_dir', nargs='?', default=None,
+                        help="директория с ANT.DAT (по умолчанию ищется как в просмотрщике)")
+    parser.add_argument('-o', '--output', default='turns_png', help="директория для PNG")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="число процессов")
+    parser.add_argument('--width', type=int, default=None,
+                        help="ширина картинки (по умолчанию как у MAP.BMP)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="подробный журнал")
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+
+    started = time.perf_counter()
+    # Ни слежения за файлами, ни истории ходов: до fork не должно быть фоновых потоков
+    viewer = MapVisualizer(game_dir=args.game_dir, watch=False)
+    viewer.prefetcher.shutdown()
+    viewer.history_builder.stop()
+    state = viewer.render_state()
+    turns = range(viewer.max_turn + 1)
+
+    canvas_bytes = pygame.image.tostring(viewer.canvas, 'RGB')
+    shm = shared_memory.SharedMemory(create=True, size=len(canvas_bytes))
+    try:
+        shm.buf[:len(canvas_bytes)] = canvas_bytes
+        os.makedirs(args.output, exist_ok=True)
+
+        rendered = 0
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(state, shm.name, args.width, args.output)) as pool:
+            for turn, path in pool.map(render_turn, turns):
+                if path:
+                    rendered += 1
+                    print(f"Ход {turn}: {path}")
+                else:
+                    print(f"Ход {turn}: файл хода не найден")
+    finally:
+        shm.close()
+        shm.unlink()
+
+    pygame.quit()
+    print(f"Отрисовано ходов: {rendered} за {time.perf_counter() - started:.2f} с")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,47 +1,163 @@
 import pygame
+import logging
 import os
-import re
 from pathlib import Path
 import codecs
 import locale
 import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.visualizer.turn_cache import TurnCache
+from src.visualizer.svs_parser import parse_svs
+from src.visualizer.cell_index import CellIndex, ARMY_TYPES
+from src.visualizer.prefetch import TurnPrefetcher
+from src.visualizer.turn_diff import diff_turns
+from src.visualizer.borders import detect_field_borders, draw_debug_marks
+from src.visualizer.sprite_atlas import SpriteAtlas, BUILDING_ICON_TYPES, bgr_to_rgb
+from src.visualizer.ant_dat import AntDat
+from src.visualizer.timings import StageTimings, timed, draw_timings_hud
+from src.visualizer.diagnostics import ParseReports, setup_logging
+from src.visualizer.tile_pyramid import TilePyramid
+from src.visualizer.map_image import MapImage
+from src.visualizer.catalog import GameCatalog, GameEntry
+from src.visualizer.watcher import create_watcher, WatchThread
+from src.visualizer.history import TurnHistory, HistoryBuilder
+from src.visualizer.stats import PlayerStats, MINE_METALS
+from src.visualizer.regions import control_surface
+from src.visualizer.heatmap import ArmyHeatmap
+from src.visualizer.tracks import trajectories
+from src.visualizer.replay import Replay, ReplayHistoryBuilder, replay_directory
+
+logger = logging.getLogger(__name__)
+
+# Пределы и шаг увеличения карты колесом мыши
+MAX_ZOOM = 8.0
+ZOOM_STEP = 1.25
+# Предел частоты кадров, пока пользователь что-то делает; без событий цикл спит
+FRAME_RATE = 60
+# Событие, которым фоновые задачи будят цикл событий
+WAKE_EVENT = pygame.event.custom_type()
+
+# Величины графика статистики: (название, значения (ход, игрок) из PlayerStats)
+STATS_METRICS = (
+    ("Войска", lambda stats: stats.total(ARMY_TYPES)),
+    ("Строения", lambda stats: stats.total('КГЗПБ')),
+    ("Замки, крепости и города", lambda stats: stats.castles + stats.cities),
+    ("Рудники", lambda stats: stats.total(MINE_METALS)),
+    ("Доход", lambda stats: stats.income),
+    ("Казна", lambda stats: stats.treasury),
+)
 
 class Turn:
     def __init__(self):
         self
 
 class MapVisualizer:
-    def __init__(self):
+    def __init__(self, debug_borders=False, game_dir=None, games_root='.',
+                 watch=True, follow_latest=False, replay=None):
         pygame.init()
+        # Отладочная визуализация поиска рамки поля
+        self.debug_borders = debug_borders
+        # Замеры этапов загрузки и отрисовки (панель - по F3)
+        self.timings = StageTimings()
+        self.timings_path = 'vs25_timings.json'
+        self.show_timings = False
+        self.timings_drawn_at = 0.0
         # Определение системной кодировки
         self.check_system_encoding()
-        # Находим рабочую директорию с файлами
-        self.find_game_directory()
-        # Читаем размеры карты из ANT.DAT
-        self.map_width, self.map_height = self.read_map_dimensions()
-        # Читаем игровые константы
-        self.read_game_constants()
+        # Каталог игр: один проход по корню, дальше - индекс
+        self.catalog = GameCatalog(games_root).scan()
+        self.catalog_thumbnails = {}  # путь игры -> миниатюра карты
+        self.catalog_rects = []
+        self.show_catalog = False
+        # График статистики игроков (S), его величина (M) и выгрузка в CSV (E)
+        self.show_stats = False
+        self.stats_metric = 0
+        self.stats = None
+        self.stats_key = None
+        self.stats_chart = None
+        self.stats_chart_key = None
+        self.stats_path = 'vs25_stats.csv'
+        self.prefetcher = None
+        # Слежение за новыми ходами; follow_latest - сразу показывать новый ход
+        self.watch = watch
+        self.follow_latest = follow_latest
+        self.watcher = None
+        self.history_builder = None
+        self.replay = None
+        self.wake_pending = threading.Event()
+        self.open_game(game_dir, replay)
+
+    def open_game(self, game_dir=None, replay=None):
+        """Загружает игру из каталога или файла повтора; повторный вызов переключает игру без перезапуска"""
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        if self.history_builder is not None:
+            self.history_builder.stop()
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
+        # Игра каталога, распакованная из повтора, снова открывается из него
+        if replay is None and game_dir is not None:
+            entry = self.catalog.get(game_dir)
+            replay = entry.replay if entry is not None else None
+        if replay is not None:
+            # Файлы карты распаковываются из повтора, ходы декодируются из него по запросу
+            self.replay = Replay(replay)
+            self.game = self.catalog.add(self.replay.extract_files(replay_directory(replay)))
+            self.game.turns = dict.fromkeys(range(len(self.replay)))
+            self.game.replay = replay
+            self.game_dir = self.game.path
+        else:
+            # Находим рабочую директорию с файлами
+            self.find_game_directory(game_dir)
+        if self.watch and self.replay is None:
+            self.watcher = WatchThread(create_watcher(self.game_dir), self.wake)
+        # Замечания разбора по ходам
+        self.parse_reports = ParseReports()
+        # Кэш разобранных ходов рядом с игровыми файлами
+        self.turn_cache = TurnCache(self.game_dir, self.parse_turn_content)
+        # Фоновая подгрузка соседних ходов
+        self.prefetcher = TurnPrefetcher(self.prepare_turn, notify=self.wake)
+        # Один раз разбираем ANT.DAT: размеры, регионы и рудники
+        self.load_map_model()
         # Загружаем фоновое изображение с учетом регистра
         self.load_background_map()
         # Создаем одну поверхность для всего содержимого
         self.prepare_canvas()
+        # Словарь для игровых элементов (нужен разбору ходов)
+        self.prepare_game_objects()
+        # Войска - все строчные типы, как в turn_diff (вместе с кораблями)
+        self.army_types = ''.join(char for char in self.game_objects if char.islower())
+        # История всех ходов для ползунка строится в фоне
+        self.history = TurnHistory(self.game_objects, track_types=self.army_types)
+        if self.replay is not None:
+            self.history_builder = ReplayHistoryBuilder(self.history, self.replay, notify=self.wake)
+            logger.info("Повтор %s: ходов %d", replay, len(self.replay))
+        else:
+            self.history_builder = HistoryBuilder(self.history, self.load_history_turn, notify=self.wake)
+        self.history_builder.start(self.max_turn)
+        self.heatmap = ArmyHeatmap(self.history, self.map_width, self.map_height, self.army_types)
         # Загружаем данные игроков из нулевого хода
-        print("Начинаем загрузку данных игроков...")
         self.load_turn_data(0)
-        print(f"Загружено игроков: {len(self.current_players)}")
-        # Словарь для игровых элементов
-        self.prepare_game_objects()
+        logger.info("Загружено игроков: %d", len(self.current_players))
         
 
         
         self.cell_size = self.calculate_cell_size()
         self.prepare_icons()
 
-        # Добавляем атрибут для хранения отладочной поверхности
-        self.debug_surface = None
-        
         # Находим границы игрового поля
         self.find_game_borders()
+        # Пирамида уменьшенных плиток карты для увеличения и прокрутки
+        self.tile_pyramid = TilePyramid(self.canvas)
 
         # Вычисляем базовый размер клетки (до масштабирования)
         self.base_cell_width = self.cell_width
@@ -58,146 +174,103 @@ class MapVisualizer:
 
         # Шрифт для всплывающего окна
         self.tooltip_font = pygame.font.Font(None, int(self.cell_height * 1.1))  # 50% от высоты клетки
+        # Готовые окна подсказок по клеткам текущего хода
+        self.tooltip_cache = OrderedDict()
+        self.tooltip_cache_owner = None
 
         # Добавляем атрибут для хранения объектов текущего хода
         self.current_turn_objects = []
 
-    def read_game_constants(self):
-        """Читает размеры поля из ANT.DAT и цвета игроков из нулевого хода"""
-        # Чтение ANT.DAT
-        try:
-            ant_file = self.find_file('ANT.DAT')
-            with open(ant_file, 'rb') as file:
-                content = file.read()
-                # Пробуем разные кодировки
-                for encoding in ['cp1251', 'cp866', 'utf-8']:
-                    try:
-                        text = content.decode(encoding)
-                        lines = text.split('\n')
-                        self.map_width = int(lines[1].strip())
-                        self.map_height = int(lines[2].strip())
-                        break
-                    except UnicodeDecodeError:
-                        continue
-        except Exception as e:
-            print(f"Ошибка чтения ANT.DAT: {e}")
-            self.map_width = 130  # Значения по умолчанию
-            self.map_height = 57
+    def find_turn_file(self, turn):
+        """Файл хода из индекса каталога (все варианты именования уже сведены)"""
+        return self.game.turn_path(turn)
 
+    def prepare_turn(self, turn):
+        """Загружает ход и строит его индекс клеток; безопасно для фоновых потоков"""
+        turn_file = self.find_turn_file(turn)
+        if not turn_file:
+            # У игры из повтора файлов ходов нет: ход берется из истории или из повтора
+            if self.history.has(turn):
+                objects, players_info = self.history.turn_players(turn)
+            elif self.replay is not None and 0 <= turn < len(self.replay):
+                objects, players_info = self.replay.turn_players(turn)
+            else:
+                return None
+            return objects, players_info, CellIndex(self.map_width, self.map_height,
+                                                    players_info, self.game_objects)
+
+        objects, players_info, warnings = self.turn_cache.get(turn_file)
+        self.parse_reports.record(turn, turn_file, warnings)
+        if warnings:
+            logger.warning("Ход %d: замечаний разбора %d (отчет - клавиша W)", turn, len(warnings))
+        cell_index = CellIndex(self.map_width, self.map_height,
+                               players_info, self.game_objects)
+        return objects, players_info, cell_index
 
+    def load_history_turn(self, turn):
+        """Игроки хода для истории (вызывается из фонового потока)"""
+        turn_file = self.find_turn_file(turn)
+        if not turn_file:
+            return None
+        _, players_info, warnings = self.turn_cache.get(turn_file)
+        self.parse_reports.record(turn, turn_file, warnings)
+        return players_info
+
+    @timed('load_turn_data')
     def load_turn_data(self, turn):
-        """Загрузка данных хода"""
+        """Загрузка данных хода (из подгруженных заранее, из истории или через кэш ходов)"""
         try:
-            # Ищем файл хода с учетом обоих вариантов именования
-            turn_file = None
-            
-            # Проверяем все возможные варианты имени файла
-            possible_names = [
-                f'Год{turn}.svs',
-                f'год{turn}.svs',
-                f'®¤{turn}.svs'
-            ]
-            
-            for name in possible_names:
-                full_path = os.path.join(self.game_dir, name)
-                if os.path.exists(full_path):
-                    turn_file = full_path
-                    break
-
-            if not turn_file:
-                return []
-
-            with open(turn_file, 'rb') as file:
-                content = file.read()
-                # Пробуем разные кодировки
-                for encoding in ['cp1251']:  #'cp1251', 'cp866', 'utf-8'
-                    try:
-                        text = content.decode(encoding)
-                        lines = text.split('\n')
-                        
-                        objects = []
-                        players_info = []  # Список для хранения информации об игроках
-                        current_player = {'name': '', 'contact': '', 'country': '', 'color': 0, 'objects': []}
-                        current_line_shift = -2
-                        
-                        for line in lines:
-                            current_line_shift = current_line_shift + 1
-                            line = line.strip().rstrip(',').strip()
-                            
-                            if not line:
-                                continue
-                            if line.startswith('END'):
-                               break
-                            if current_line_shift == -1:
-                                # Заголовочная строка
-                                # Обработать словарь
-                                        continue
-                            if line.startswith('Player'):
-                                print(f"Найден заголоок Player ---------------------------------------------------")
-                                current_line_shift = 0
-                                if current_player:
-                                    players_info.append(current_player)
-                                    current_player = {'name': '', 'contact': '', 'country': '', 'color': 0, 'objects': []}
-                                    current_line_shift = -1
-                                continue
-                            elif current_line_shift == 0:
-                                # Разделяем строку на части
-                                parts = line.split(' (')
-                                if len(parts) == 2:
-                                    player = parts[0].strip()  # Всё до скобки
-                                    remaining = parts[1].split(') ', 1)  # Разделяем по закрывающей скобке
-                                    if len(remaining) == 2:
-                                        player_name = remaining[0].strip()  # Текст внутри скобок
-                                        player_country = remaining[1].strip()  # Всё после скобки
-                                        current_player['name'] = player
-                                        current_player['contact'] = player_name
-                                        current_player['country'] = player_country
-                                        print(f"Найдена строка с именем игрока: {player}")
-                                        continue
-                            elif current_line_shift == 1:
-                                # Строка с данными игрока (координаты, казна, цвет)
-                                parts = line.split()
-                                try:
-                                    current_player['color'] = int(parts[2])
-                                    print(f"Найден цвет: {current_player['color']}")
-                                    continue
-                                except (ValueError, IndexError):
-                                    continue
-                            else:
-                                # Парсим координаты объекта
-                                parts = [part.strip() for part in line.split() if part.strip()]
-                                if len(parts) >= 3:
-                                    obj_type = parts[0]
-                                    if obj_type in self.game_objects:
-                                        try:
-                                            x = int(parts[1])
-                                            y = int(parts[2])
-                                            state = int(parts[3].rstrip(',')) if len(parts) > 3 else 0
-                                            obj = (obj_type, x, y, state, current_player['color'])
-                                            objects.append(obj)
-                                            print(f"Найдены объекты {objects}")
-                                            if current_player:
-                                                current_player['objects'].append(obj)
-                                        except (ValueError, IndexError) as e:
-                                            print(f"Ошибка парсинга строки '{line}': {e}")
-                                    else:
-                                        # Пропускаем неизвестные типы объектов без вывода ошибки
-                                        continue
-                        
-                         # Добавляем последнего игрока
-                        if current_player:
-                            players_info.append(current_player)
-                        
-                        # Сохраняем информацию об игроках
-                        self.current_players = players_info
-                        return objects
-                    except UnicodeDecodeError:
-                        continue
-                        
+            prepared = self.prefetcher.take(turn)
+            if prepared is None and self.history.has(turn):
+                objects, players_info = self.history.turn_players(turn)
+                prepared = (objects, players_info, CellIndex(self.map_width, self.map_height,
+                                                             players_info, self.game_objects))
+                self.prefetcher.put(turn, prepared)
+            if prepared is None:
+                prepared = self.prepare_turn(turn)
+                if prepared is None:
+                    return []
+                self.prefetcher.put(turn, prepared)
+
+            # Сохраняем информацию об игроках и индекс клеток хода
+            objects, self.current_players, self.cell_index = prepared
+
+            # Пока ход показан, в фоне готовим соседние
+            self.prefetcher.schedule(turn, self.max_turn)
+            return objects
+
         except Exception as e:
-            print(f"Ошибка загрузки хода {turn}: {e}")
+            logger.exception("Ошибка загрузки хода %d: %s", turn, e)
             return []
 
+    def parse_turn_content(self, content):
+        """Разбор содержимого файла хода, возвращает (objects, players_info, warnings)"""
+        parsed = parse_svs(content)
+
+        objects = []
+        players_info = []  # Список для хранения информации об игроках
+        columns = parsed.objects
+        for player in parsed.players:
+            current_player = {
+                'name': player.name,
+                'contact': player.contact,
+                'country': player.country,
+                'income': player.income,
+                'treasury': player.treasury,
+                'color': player.color,
+                'objects': []
+            }
+            for i in range(player.start, player.end):
+                obj_type = chr(columns.types[i])
+                # Пропускаем неизвестные типы объектов
+                if obj_type in self.game_objects:
+                    obj = (obj_type, columns.xs[i], columns.ys[i], columns.states[i], player.color)
+                    objects.append(obj)
+                    current_player['objects'].append(obj)
+            players_info.append(current_player)
+
+        return objects, players_info, parsed.warnings
+
     def load_icons(self, filename, count):
         """Загружает и разделяет изображение на отдельные иконки"""
         try:
@@ -219,27 +292,30 @@ class MapVisualizer:
                 icons.append(icon)
             return icons
         except pygame.error as e:
-            print(f"Ошибка загрузки {filename}: {e}")
+            logger.error("Ошибка загрузки %s: %s", filename, e)
             return []
 
-    def draw_game_objects(self, objects):
+    @timed('draw_game_objects')
+    def draw_game_objects(self, objects, surface=None):
         """Отрисовка игровых объектов"""
-        # Сохраняем объекты текущего хода
-        self.current_turn_objects = objects
-        
-        # Получаем коэффициенты масштабирования
-        scale_x = self.scaled_canvas.get_width() / self.canvas_width
-        scale_y = self.scaled_canvas.get_height() / self.canvas_height
-        
-        # Получаем смещение канвы для центрирования
-        canvas_x = (self.screen_width - self.scaled_canvas.get_width()) // 2
-        canvas_y = 0
-        
+        if surface is None:
+            surface = self.screen
+        # Смещение и масштаб канвы на экране с учетом увеличения и прокрутки
+        canvas_x, canvas_y, scale_x, scale_y = self.view_transform()
+        # Объекты вне видимой области не рисуем
+        visible = surface.get_clip()
+
         # Используем оригинальные размеры клеток для расчета позиций
         cell_width = self.field_bounds[2] / self.map_width
         cell_height = self.field_bounds[3] / self.map_height
         
-        for obj_type, x, y, state, color in objects:
+        # Размеры спрайтов строений (во всю клетку) и войск (80% клетки)
+        building_size = int(min(cell_width, cell_height) * scale_x)
+        army_size = int(min(cell_width, cell_height) * scale_x * 0.8)
+        self.sprite_atlas.use_sizes((building_size, army_size))
+
+        sprites = []
+        for obj_type, x, y, _, color in objects:
             # Рассчитываем координаты в оригинальном масштабе
             original_x = self.field_bounds[0] + (x - 1) * cell_width
             original_y = self.field_bounds[1] + (y - 1) * cell_height
@@ -252,154 +328,77 @@ class MapVisualizer:
             cell_center_x = scaled_x + (cell_width * scale_x) / 2
             cell_center_y = scaled_y + (cell_height * scale_y) / 2
             
-            # Определяем тип объекта (строение или войско)
-            is_building = obj_type in ['К', 'Г', 'З', 'П', 'Б', 'C', 'S', 'G', 'M']
-            is_army = obj_type.islower()  # Все войска обозначаются строчными буквами
-            
             # Используем разные размеры для армий и строений
-            if is_building:
-                icon_size = int(min(cell_width, cell_height) * scale_x)  # Полный размер клетки для строений
-            else:
-                icon_size = int(min(cell_width, cell_height) * scale_x * 0.8)  # 80% размера для армий
+            icon_size = building_size if obj_type in BUILDING_ICON_TYPES else army_size
+            if not (visible.left - icon_size <= cell_center_x <= visible.right + icon_size and
+                    visible.top - icon_size <= cell_center_y <= visible.bottom + icon_size):
+                continue
 
-            # Получаем цвет игрока
-            # Преобразуем число
-            r = (color) & 255
-            g = (color >> 8) & 255
-            b = (color >> 16) & 255
+            # Спрайт (подложка цвета игрока с пиктограммой) берется из атласа
+            sprite = self.sprite_atlas.get(obj_type, color, icon_size)
+            sprites.append((sprite, (int(cell_center_x) - icon_size // 2,
+                                     int(cell_center_y) - icon_size // 2)))
 
-            player_color = (r, g, b)
-            # Вычисляем координаты для отрисовки
-            circle_center = (int(cell_center_x), int(cell_center_y))
-            
-            if is_army:  # Рисуем круг только для войск
-                # Рисуем круг с цветом игрока
-                pygame.draw.circle(self.screen, player_color, circle_center, icon_size // 2)
-                
-                # Определяем цвет обводки на основе яркости цвета игрока
-                #r, g, b = player_color
-                brightness = (r + g + b) / 3
-                outline_color = (0, 0, 0) if brightness > 127 else (255, 255, 255)
-                
-                # Рисуем обводку толщиной 1 пиксель
-                pygame.draw.circle(self.screen, outline_color, circle_center, icon_size // 2, 1)
-            else:  # Для строений рисуем прямоугольник с заливкой
-                rect = pygame.Rect(
-                    int(cell_center_x - icon_size // 2),
-                    int(cell_center_y - icon_size // 2),
-                    icon_size,
-                    icon_size
-                )
-                pygame.draw.rect(self.screen, player_color, rect)
-            
-            # Определяем, какой набор иконок использовать
-            if obj_type in ['C', 'S', 'G', 'M']:
-                icons = self.mine_icons
-            else:
-                icons = self.army_icons
-            
-            # Получаем и отрисовываем иконку
-            if obj_type in self.icon_indices:
-                icon_index = self.icon_indices[obj_type]
-                icon = icons[icon_index]
-                scaled_icon = pygame.transform.scale(icon, (icon_size, icon_size))
-                
-                # Вычисляем позицию для центрирования иконки
-                icon_x = int(cell_center_x - icon_size // 2)
-                icon_y = int(cell_center_y - icon_size // 2)
-                
-                self.screen.blit(scaled_icon, (icon_x, icon_y))
-            
-            # Убираем отрисовку дополнительных обводок состояний
-            # if state & 128:  # Столица/ЛВ
-            #     pygame.draw.circle(self.screen, (255, 215, 0), circle_center, icon_size // 2 + 2, 2)
-            # elif state & 32:  # Без АД
-            #     pygame.draw.circle(self.screen, (128, 128, 128), circle_center, icon_size // 2 + 2, 2)
-            # 
-            # if state & 64:  # На воде
-            #     pygame.draw.circle(self.screen, (0, 0, 255), circle_center, icon_size // 2 + 4, 2)
-
-        # После отрисовки всех объектов добавляем подсветку текущей клетки
-        mouse_pos = pygame.mouse.get_pos()
-        self.draw_cell_highlight(mouse_pos)
+        # Весь ход выводится одной пачкой копирований
+        surface.blits(sprites, doreturn=False)
 
+    @timed('draw_cell_highlight')
     def draw_cell_highlight(self, mouse_pos):
-        """Отрисовка подсветки клетки под курсором"""
-        # Получаем коэффициенты масштабирования
-        scale_x = self.scaled_canvas.get_width() / self.canvas_width
-        scale_y = self.scaled_canvas.get_height() / self.canvas_height
-        
-        # Получаем смещение канвы для центрирования
-        canvas_x = (self.screen_width - self.scaled_canvas.get_width()) // 2
-        canvas_y = 0
-        
-        # Проверяем, находится ли курсор в пределах канвы
-        canvas_rect = pygame.Rect(
-            canvas_x, 
-            0, 
-            self.scaled_canvas.get_width(), 
-            self.scaled_canvas.get_height()
-        )
+        """Отрисовка подсветки клетки под курсором, возвращает измененные области"""
+        # Смещение и масштаб канвы на экране с учетом увеличения и прокрутки
+        canvas_x, canvas_y, scale_x, scale_y = self.view_transform()
+
+        # Проверяем, находится ли курсор в видимой части канвы
+        canvas_rect = self.canvas_screen_rect()
         
         if not canvas_rect.collidepoint(mouse_pos):
             pygame.mouse.set_visible(True)
-            return
+            return []
             
         pygame.mouse.set_visible(False)
         
-        # Преобразуем координаты мыши в координаты внутри канвы
-        field_x = (mouse_pos[0] - canvas_x) / scale_x
-        field_y = mouse_pos[1] / scale_y
-        
-        # Получаем границы игрового поля
-        field_left, field_top, field_width, field_height = self.field_bounds
-        
-        # Проверяем, находится ли курсор в пределах игрового поля
-        if (field_left <= field_x <= field_left + field_width and 
-            field_top <= field_y <= field_top + field_height):
+        field_left, field_top, _, _ = self.field_bounds
+        cell = self.cell_at(mouse_pos)
+        if cell is not None:
+            cell_x, cell_y = cell
+            # Рассчитываем координаты в оригинальном масштабе
+            original_x = field_left + cell_x * self.base_cell_width
+            original_y = field_top + cell_y * self.base_cell_height
             
-            # Вычисляем индексы клетки (с учетом того, что игровые координаты начинаются с 1)
-            cell_x = int((field_x - field_left) / self.base_cell_width)
-            cell_y = int((field_y - field_top) / self.base_cell_height)
+            # Масштабируем координаты
+            scaled_x = canvas_x + original_x * scale_x
+            scaled_y = canvas_y + original_y * scale_y
             
-            # Проверяем, находится ли клетка в пределах сетки
-            if 0 <= cell_x < self.map_width and 0 <= cell_y < self.map_height:
-                # Рассчитываем координаты в оригинальном масштабе
-                original_x = field_left + cell_x * self.base_cell_width
-                original_y = field_top + cell_y * self.base_cell_height
-                
-                # Масштабируем координаты
-                scaled_x = canvas_x + original_x * scale_x
-                scaled_y = original_y * scale_y
-                
-                # Вычисляем размер иконки как для зданий
-                icon_size = int(min(self.base_cell_width, self.base_cell_height) * scale_x)
-                
-                # Вычисляем центр клетки
-                cell_center_x = scaled_x + (self.base_cell_width * scale_x) / 2
-                cell_center_y = scaled_y + (self.base_cell_height * scale_y) / 2
-                
-                # Создаем прямоугольник для подсветки относительно центра клетки
-                rect = pygame.Rect(
-                    int(cell_center_x - icon_size // 2),
-                    int(cell_center_y - icon_size // 2),
-                    icon_size,
-                    icon_size
-                )
-                
-                # Создаем поверхность для подсветки
-                highlight_surface = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
-                highlight_surface.fill((255, 255, 255, 64))
-                
-                # Отрисовываем подсветку
-                self.screen.blit(highlight_surface, rect)
-                
-                # Рисуем контур
-                pygame.draw.rect(self.screen, (255, 255, 255), rect, 1)
-                
-                # Отрисовываем всплывающее окно только для подсвеченной клетки
-                terrain_type = self.get_cell_terrain(cell_x, cell_y)
-                self.draw_coordinates_tooltip((cell_center_x, cell_center_y), cell_x, cell_y, terrain_type)
+            # Вычисляем размер иконки как для зданий
+            icon_size = int(min(self.base_cell_width, self.base_cell_height) * scale_x)
+            
+            # Вычисляем центр клетки
+            cell_center_x = scaled_x + (self.base_cell_width * scale_x) / 2
+            cell_center_y = scaled_y + (self.base_cell_height * scale_y) / 2
+            
+            # Создаем прямоугольник для подсветки относительно центра клетки
+            rect = pygame.Rect(
+                int(cell_center_x - icon_size // 2),
+                int(cell_center_y - icon_size // 2),
+                icon_size,
+                icon_size
+            )
+            
+            # Создаем поверхность для подсветки
+            highlight_surface = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
+            highlight_surface.fill((255, 255, 255, 64))
+            
+            # Отрисовываем подсветку
+            self.screen.blit(highlight_surface, rect)
+            
+            # Рисуем контур
+            pygame.draw.rect(self.screen, (255, 255, 255), rect, 1)
+            
+            # Отрисовываем всплывающее окно только для подсвеченной клетки
+            terrain_type = self.get_cell_terrain(cell_x, cell_y)
+            tooltip_rect = self.draw_coordinates_tooltip((cell_center_x, cell_center_y), cell_x, cell_y, terrain_type)
+            return [rect, tooltip_rect]
+        return []
 
     def draw_interface(self):
         """Отрисовка интерфейса управления"""
@@ -437,6 +436,24 @@ class MapVisualizer:
         turn_rect = turn_text.get_rect(midleft=(button_margin * 3 + button_width * 2,
                                                self.panel_y + self.panel_height // 2))
         self.screen.blit(turn_text, turn_rect)
+
+        # Ползунок ходов: справа от номера хода до края панели
+        slider_left = turn_rect.left + self.font.size("Ход: 0000")[0] + button_margin * 2
+        self.slider_rect = None
+        if self.max_turn > 0 and self.screen_width - button_margin - slider_left > 50:
+            self.slider_rect = pygame.Rect(slider_left, self.panel_y + self.panel_height // 2 - 4,
+                                           self.screen_width - button_margin - slider_left, 8)
+            pygame.draw.rect(self.screen, (160, 160, 160), self.slider_rect)
+            # Ходы, уже попавшие в историю
+            self.slider_loaded = len(self.history)
+            loaded = min(self.slider_loaded, self.max_turn + 1) / (self.max_turn + 1)
+            loaded_rect = self.slider_rect.copy()
+            loaded_rect.width = int(self.slider_rect.width * loaded)
+            pygame.draw.rect(self.screen, (110, 110, 110), loaded_rect)
+            knob_x = self.slider_rect.left + self.slider_rect.width * self.current_turn // self.max_turn
+            knob = pygame.Rect(0, 0, 8, self.slider_rect.height + 12)
+            knob.center = (knob_x, self.slider_rect.centery)
+            pygame.draw.rect(self.screen, (40, 40, 40), knob)
         
         # Отрисовка панели игроков
         player_panel_rect = pygame.Rect(0, self.player_panel_y, 
@@ -445,7 +462,7 @@ class MapVisualizer:
         
         # Отрисовка цветных прямоугольников игроков
         x = 10
-        # player_rects = []
+        self.player_rects = []
         
         for player in self.current_players:
             color = player.get('color', 0)
@@ -471,8 +488,10 @@ class MapVisualizer:
             self.screen.blit(name_surface, (10, info_y))
         
         # Возвращаем все интерактивные элементы
-        return [prev_button, next_button] + [rect for rect, _ in self.player_rects]
+        self.button_rects = [prev_button, next_button] + [rect for rect, _ in self.player_rects]
+        return self.button_rects
 
+    @timed('handle_resize')
     def handle_resize(self, width, height):
         """Обработка изменения размера окна"""
         # Сохраняем новые размеры окна
@@ -498,8 +517,65 @@ class MapVisualizer:
         self.panel_y = canvas_height
         self.player_panel_y = self.panel_y + self.panel_height
 
+        # Увеличенный вид остается в пределах карты
+        if self.zoom > 1:
+            self.view_center = self.clamp_view_center(*self.view_center)
+
+        # Окно пересоздано - все слои нужно вывести заново
+        self.invalidate_layers()
+
+    @timed('draw_coordinates_tooltip')
     def draw_coordinates_tooltip(self, pos, cell_x, cell_y, terrain_type):
         """Отрисовка всплывающего окна с информацией о клетке"""
+        tooltip = self.get_tooltip_surface(cell_x, cell_y, terrain_type)
+        tooltip_width, tooltip_height = tooltip.get_size()
+
+        # Определяем позицию окна относительно центра клетки
+        tooltip_x = pos[0] + 10
+        tooltip_y = pos[1] - tooltip_height - 10
+        
+        # Корректируем позицию, чтобы окно не выходило за пределы экрана
+        if tooltip_x + tooltip_width > self.screen_width:
+            tooltip_x = pos[0] - tooltip_width - 10
+        if tooltip_x < 0:
+            tooltip_x = 10
+            
+        if tooltip_y < 0:
+            tooltip_y = pos[1] + 10
+        if tooltip_y + tooltip_height > self.panel_y:
+            tooltip_y = self.panel_y - tooltip_height - 10
+        
+        background_rect = pygame.Rect(tooltip_x, tooltip_y, tooltip_width, tooltip_height)
+        self.screen.blit(tooltip, background_rect)
+        return background_rect
+
+    def get_tooltip_surface(self, cell_x, cell_y, terrain_type):
+        """Готовое окно подсказки клетки из кэша (ход, клетка, размер шрифта).
+
+        Кэш сбрасывается целиком, когда меняется индекс клеток (другой ход)
+        или размер шрифта подсказки.
+        """
+        font_size = self.tooltip_font.get_height()
+        # Сам индекс, а не его id(): id освобожденного индекса может достаться новому
+        owner = self.tooltip_cache_owner
+        if owner is None or owner[0] is not self.cell_index or owner[1] != font_size:
+            self.tooltip_cache.clear()
+            self.tooltip_cache_owner = (self.cell_index, font_size)
+
+        key = (self.current_turn, cell_x, cell_y, font_size)
+        tooltip = self.tooltip_cache.get(key)
+        if tooltip is not None:
+            self.tooltip_cache.move_to_end(key)
+            return tooltip
+
+        tooltip = self.render_tooltip(self.tooltip_lines(cell_x, cell_y, terrain_type))
+        self.tooltip_cache[key] = tooltip
+        if len(self.tooltip_cache) > 256:
+            self.tooltip_cache.popitem(last=False)
+        return tooltip
+
+    def tooltip_lines(self, cell_x, cell_y, terrain_type):
+        """Строки подсказки: координаты и регион, строения, войска"""
         # Получаем тип местности
         terrain_info = self.get_terrain_info(terrain_type)
         
@@ -512,127 +588,872 @@ class MapVisualizer:
             coord_text += f" - {terrain_info}"
         lines.append(coord_text)
         
-        # Добавляем информацию о строениях
-        buildings = self.get_cell_buildings(cell_x, cell_y)
+        # Добавляем информацию о строениях (владелец уже известен индексу)
+        buildings = self.cell_index.buildings(cell_x, cell_y)
         if buildings:
             lines.append("")  # Пустая строка для разделения
             for building in buildings:
-                owner = self.get_building_owner(cell_x, cell_y, building)
-                if owner:
-                    lines.append(f"{building} (Игрок {owner})")
+                if building.owner:
+                    lines.append(f"{building.name} (Игрок {building.owner})")
                 else:
-                    lines.append(building)
+                    lines.append(building.name)
         
         # Добавляем информацию о войсках
-        armies = self.get_cell_armies(cell_x, cell_y)
+        armies = self.cell_index.armies(cell_x, cell_y)
         if armies:
             if not buildings:
                 lines.append("")  # Пустая строка для разделения
             for army in armies:
-                owner = self.get_army_owner(cell_x, cell_y, army)
-                if owner:
-                    lines.append(f"{army} (Игрок {owner})")
+                if army.owner:
+                    lines.append(f"{army.name} (Игрок {army.owner})")
                 else:
-                    lines.append(army)
-        
-        # Вычисляем размеры окна
+                    lines.append(army.name)
+        return lines
+
+    def render_tooltip(self, lines):
+        """Окно подсказки с рамкой; каждая строка рендерится один раз"""
         padding = 5
         line_height = self.tooltip_font.get_height()
-        max_width = 0
-        
-        # Получаем максимальную ширину текста
-        for line in lines:
-            text_surface = self.tooltip_font.render(line, True, (0, 0, 0))
-            max_width = max(max_width, text_surface.get_width())
-        
-        tooltip_width = max_width + (padding * 2)
-        tooltip_height = (len(lines) * line_height) + (padding * 2)
-        
-        # Определяем позицию окна относительно центра клетки
-        tooltip_x = pos[0] + 10
-        tooltip_y = pos[1] - tooltip_height - 10
-        
-        # Корректируем позицию, чтобы окно не выходило за пределы экрана
-        if tooltip_x + tooltip_width > self.screen_width:
-            tooltip_x = pos[0] - tooltip_width - 10
-        if tooltip_x < 0:
-            tooltip_x = 10
-            
-        if tooltip_y < 0:
-            tooltip_y = pos[1] + 10
-        if tooltip_y + tooltip_height > self.panel_y:
-            tooltip_y = self.panel_y - tooltip_height - 10
-        
-        # Отрисовываем фон
-        background_rect = pygame.Rect(tooltip_x, tooltip_y, tooltip_width, tooltip_height)
-        pygame.draw.rect(self.screen, (255, 255, 255), background_rect)
-        pygame.draw.rect(self.screen, (0, 0, 0), background_rect, 1)
-        
-        # Отрисовываем текст
-        current_y = tooltip_y + padding
-        for line in lines:
-            text_surface = self.tooltip_font.render(line, True, (0, 0, 0))
-            self.screen.blit(text_surface, (tooltip_x + padding, current_y))
-            current_y += line_height
-
-    def draw_canvas(self):
+        texts = [self.tooltip_font.render(line, True, (0, 0, 0)) for line in lines]
+        max_width = max(text.get_width() for text in texts)
+
+        tooltip = pygame.Surface((max_width + padding * 2, len(lines) * line_height + padding * 2))
+        tooltip.fill((255, 255, 255))
+        pygame.draw.rect(tooltip, (0, 0, 0), tooltip.get_rect(), 1)
+        tooltip.blits([(text, (padding, padding + number * line_height))
+                       for number, text in enumerate(texts)], doreturn=False)
+        return tooltip
+
+    @timed('draw_canvas')
+    def draw_canvas(self, surface=None):
         """Отрисовка канвы"""
+        if surface is None:
+            surface = self.screen
         # Очищаем экран
-        self.screen.fill((255, 255, 255))
+        surface.fill((255, 255, 255))
+
+        if self.zoom > 1:
+            # Увеличенная карта собирается из видимых плиток пирамиды
+            offset_x, offset_y, scale_x, scale_y = self.view_transform()
+            self.tile_pyramid.draw(surface, offset_x, offset_y, scale_x, scale_y,
+                                   surface.get_clip().clip(self.map_viewport()))
+            return
         
         # Вычисляем позицию для центрирования канвы
         x = (self.screen_width - self.scaled_canvas.get_width()) // 2
         y = 0  # Прижимаем к верхнему краю
         
         # Отрисовываем масштабированную канву
-        self.screen.blit(self.scaled_canvas, (x, y))
+        surface.blit(self.scaled_canvas, (x, y))
+
+    def invalidate_layers(self):
+        """Сбрасывает кэш статического слоя и требует перерисовки панели"""
+        self.static_key = None
+        self.panel_dirty = True
+
+    def build_static_layer(self):
+        """Статический слой: масштабированная карта и все объекты хода"""
+        size = (self.screen_width, self.panel_y)
+        if self.static_layer is None or self.static_layer.get_size() != size:
+            self.static_layer = pygame.Surface(size)
+        self.draw_canvas(self.static_layer)
+        if self.show_regions:
+            self.draw_cell_surface(self.static_layer, self.region_surface())
+        if self.show_heatmap:
+            self.draw_cell_surface(self.static_layer, self.heatmap.surface(*self.heatmap_range()))
+        if self.show_tracks:
+            self.draw_tracks(self.static_layer)
+        self.draw_game_objects(self.current_turn_objects, self.static_layer)
+        if self.diff_mode:
+            self.draw_turn_changes(self.static_layer)
+
+    def region_surface(self):
+        """Контроль регионов показанного хода: клетка на пиксель, кэш по ходам"""
+        surface = self.region_surfaces.get(self.current_turn)
+        if surface is None:
+            surface = control_surface(self.map_model, self.current_players)
+            self.region_surfaces[self.current_turn] = surface
+            while len(self.region_surfaces) > 32:
+                self.region_surfaces.popitem(last=False)
+        else:
+            self.region_surfaces.move_to_end(self.current_turn)
+        return surface
+
+    def draw_tracks(self, surface):
+        """Пути войск показанного хода за track_length ходов (выбранного игрока или всех)"""
+        owners = self.heatmap_range()[0]
+        players, xs, ys = trajectories(self.history, self.current_turn, self.track_length, owners)
+        if not len(players):
+            return
+        # Номер игрока партии -> цвет в показанном ходе
+        colors = {}
+        for player in self.current_players:
+            player_id = self.history.player_ids.get((player.get('name', ''), player.get('contact', ''),
+                                                     player.get('country', '')))
+            colors[player_id] = bgr_to_rgb(player.get('color', 0))
+
+        # Центры клеток на экране
+        canvas_x, canvas_y, scale_x, scale_y = self.view_transform()
+        cell_width = self.field_bounds[2] / self.map_width
+        cell_height = self.field_bounds[3] / self.map_height
+        screen_xs = canvas_x + (self.field_bounds[0] + (xs - 0.5) * cell_width) * scale_x
+        screen_ys = canvas_y + (self.field_bounds[1] + (ys - 0.5) * cell_height) * scale_y
+        width = max(1, int(min(cell_width * scale_x, cell_height * scale_y) / 8))
+        for index, player_id in enumerate(players.tolist()):
+            valid = ~np.isnan(screen_xs[:, index])
+            points = np.column_stack((screen_xs[valid, index], screen_ys[valid, index])).tolist()
+            # Войско, не сходившее с места, пути не имеет
+            if all(point == points[0] for point in points):
+                continue
+            color = colors.get(player_id, (255, 255, 255))
+            pygame.draw.lines(surface, color, False, points, width)
+            pygame.draw.circle(surface, color, points[0], width + 1)
+
+    def heatmap_range(self):
+        """(игроки, первый ход, последний ход) тепловой карты.
+
+        Игроки - выбранный игрок или все (None); ходы - heat_span ходов до
+        показанного включительно, в пределах уже построенной истории.
+        """
+        owners = None
+        if self.selected_player is not None:
+            player_id = self.history.player_ids.get((self.selected_player.get('name', ''),
+                                                     self.selected_player.get('contact', ''),
+                                                     self.selected_player.get('country', '')))
+            owners = frozenset((player_id,)) if player_id is not None else frozenset()
+        last = min(self.current_turn, len(self.history) - 1)
+        return owners, max(0, self.current_turn - self.heat_span + 1), last
+
+    def draw_cell_surface(self, surface, cells_surface):
+        """Накладывает поверхность "клетка на пиксель" на поле; масштабируется только видимая часть"""
+        canvas_x, canvas_y, scale_x, scale_y = self.view_transform()
+        cell_width = self.field_bounds[2] / self.map_width * scale_x
+        cell_height = self.field_bounds[3] / self.map_height * scale_y
+        left = canvas_x + self.field_bounds[0] * scale_x
+        top = canvas_y + self.field_bounds[1] * scale_y
+
+        # Видимые клетки (с 0) и их прямоугольник на экране
+        visible = surface.get_clip()
+        x0 = max(0, int((visible.left - left) // cell_width))
+        y0 = max(0, int((visible.top - top) // cell_height))
+        x1 = min(self.map_width, int(-(-(visible.right - left) // cell_width)))
+        y1 = min(self.map_height, int(-(-(visible.bottom - top) // cell_height)))
+        if x0 >= x1 or y0 >= y1:
+            return
+        screen_left = int(left + x0 * cell_width)
+        screen_top = int(top + y0 * cell_height)
+        size = (int(left + x1 * cell_width) - screen_left, int(top + y1 * cell_height) - screen_top)
+        cells = cells_surface.subsurface((x0, y0, x1 - x0, y1 - y0))
+        surface.blit(pygame.transform.scale(cells, size), (screen_left, screen_top))
+
+    def map_viewport(self):
+        """Область окна под карту (над панелями)"""
+        return pygame.Rect(0, 0, self.screen_width, self.panel_y)
+
+    def view_transform(self):
+        """(смещение x, смещение y, масштаб x, масштаб y) канвы на экране.
+
+        Экранная координата пикселя канвы px: смещение + px * масштаб.
+        Без увеличения канва вписана в окно и выровнена по центру.
+        """
+        scale_x = self.scaled_canvas.get_width() / self.canvas_width
+        scale_y = self.scaled_canvas.get_height() / self.canvas_height
+        if getattr(self, 'zoom', 1.0) <= 1:
+            return (self.screen_width - self.scaled_canvas.get_width()) // 2, 0, scale_x, scale_y
+
+        scale_x *= self.zoom
+        scale_y *= self.zoom
+        center_x, center_y = self.view_center
+        return (round(self.screen_width / 2 - center_x * scale_x),
+                round(self.panel_y / 2 - center_y * scale_y), scale_x, scale_y)
+
+    def canvas_screen_rect(self):
+        """Видимая часть канвы на экране"""
+        canvas_x, canvas_y, _, _ = self.view_transform()
+        rect = pygame.Rect(canvas_x, canvas_y,
+                           round(self.scaled_canvas.get_width() * getattr(self, 'zoom', 1.0)),
+                           round(self.scaled_canvas.get_height() * getattr(self, 'zoom', 1.0)))
+        if getattr(self, 'zoom', 1.0) <= 1:
+            return rect
+        return rect.clip(self.map_viewport())
+
+    def clamp_view_center(self, center_x, center_y):
+        """Не дает прокрутить карту дальше ее краев"""
+        _, _, scale_x, scale_y = self.view_transform()
+        center = []
+        for value, view_size, canvas_size, scale in (
+                (center_x, self.screen_width, self.canvas_width, scale_x),
+                (center_y, self.panel_y, self.canvas_height, scale_y)):
+            half = view_size / 2 / scale
+            if canvas_size <= half * 2:
+                center.append(canvas_size / 2)
+            else:
+                center.append(min(max(value, half), canvas_size - half))
+        return tuple(center)
+
+    def zoom_at(self, pos, factor):
+        """Меняет увеличение так, чтобы точка карты под курсором осталась на месте"""
+        zoom = min(max(self.zoom * factor, 1.0), MAX_ZOOM)
+        if zoom == self.zoom:
+            return
+        canvas_x, canvas_y, scale_x, scale_y = self.view_transform()
+        # Точка канвы под курсором
+        point_x = (pos[0] - canvas_x) / scale_x
+        point_y = (pos[1] - canvas_y) / scale_y
+
+        self.zoom = zoom
+        if zoom == 1.0:
+            self.view_center = None
+            return
+        self.view_center = (0, 0)
+        _, _, scale_x, scale_y = self.view_transform()
+        self.view_center = self.clamp_view_center(
+            point_x - (pos[0] - self.screen_width / 2) / scale_x,
+            point_y - (pos[1] - self.panel_y / 2) / scale_y)
+
+    def pan_to(self, pos):
+        """Прокрутка перетаскиванием: карта следует за курсором от точки захвата"""
+        if self.zoom <= 1 or self.drag_start is None:
+            return
+        _, _, scale_x, scale_y = self.view_transform()
+        start_pos, start_center = self.drag_start
+        self.view_center = self.clamp_view_center(
+            start_center[0] - (pos[0] - start_pos[0]) / scale_x,
+            start_center[1] - (pos[1] - start_pos[1]) / scale_y)
+
+    def cell_at(self, mouse_pos):
+        """Клетка (x, y с 0) под точкой экрана или None"""
+        canvas_x, canvas_y, scale_x, scale_y = self.view_transform()
+        # Координаты внутри канвы
+        field_x = (mouse_pos[0] - canvas_x) / scale_x
+        field_y = (mouse_pos[1] - canvas_y) / scale_y
+        field_left, field_top, field_width, field_height = self.field_bounds
+        if not (field_left <= field_x <= field_left + field_width and
+                field_top <= field_y <= field_top + field_height):
+            return None
+        cell_x = int((field_x - field_left) / self.base_cell_width)
+        cell_y = int((field_y - field_top) / self.base_cell_height)
+        if 0 <= cell_x < self.map_width and 0 <= cell_y < self.map_height:
+            return cell_x, cell_y
+        return None
+
+    def hover_key(self, mouse_pos):
+        """От чего зависит оверлей под курсором: движение внутри клетки его не меняет.
+
+        None - курсор вне карты, иначе (True, клетка или None вне поля).
+        """
+        if not self.canvas_screen_rect().collidepoint(mouse_pos):
+            return None
+        return True, self.cell_at(mouse_pos)
+
+    def cell_screen_rect(self, x, y):
+        """Прямоугольник клетки на экране (игровые координаты с 1)"""
+        canvas_x, canvas_y, scale_x, scale_y = self.view_transform()
+        cell_width = self.field_bounds[2] / self.map_width
+        cell_height = self.field_bounds[3] / self.map_height
+
+        left = canvas_x + (self.field_bounds[0] + (x - 1) * cell_width) * scale_x
+        top = canvas_y + (self.field_bounds[1] + (y - 1) * cell_height) * scale_y
+        return pygame.Rect(int(left), int(top),
+                           int(cell_width * scale_x) + 1, int(cell_height * scale_y) + 1)
+
+    def update_static_layer(self):
+        """Перерисовывает в статическом слое только клетки, изменившиеся с прошлого хода.
+
+        Возвращает список обновленных областей или None, если дешевле
+        перестроить слой целиком.
+        """
+        diff = diff_turns(self.static_players, self.current_players)
+        cells = diff.changed_cells()
+        # Цвет владельца в сравнение объектов не входит: у игрока со сменившимся
+        # цветом перерисовываются все клетки с его объектами
+        old_colors = {player.get('name', ''): player.get('color', 0) for player in self.static_players}
+        for player in self.current_players:
+            if old_colors.get(player.get('name', ''), player.get('color', 0)) != player.get('color', 0):
+                cells.update((obj[1], obj[2]) for obj in player.get('objects', []))
+        if len(cells) > self.map_width * self.map_height // 4:
+            return None
+
+        # Спрайты соседних клеток могут заходить в клетку на пару пикселей,
+        # поэтому в каждой клетке перерисовываются и объекты соседей
+        nearby = {cell: [] for cell in cells}
+        for obj in self.current_turn_objects:
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    cell_objects = nearby.get((obj[1] + dx, obj[2] + dy))
+                    if cell_objects is not None:
+                        cell_objects.append(obj)
+
+        layer_rect = self.static_layer.get_rect()
+        rects = []
+        for cell in cells:
+            rect = self.cell_screen_rect(*cell).inflate(4, 4).clip(layer_rect)
+            self.static_layer.set_clip(rect)
+            self.draw_canvas(self.static_layer)
+            self.draw_game_objects(nearby[cell], self.static_layer)
+            rects.append(rect)
+        self.static_layer.set_clip(None)
+        return rects
+
+    def draw_turn_changes(self, surface):
+        """Режим изменений: затемняет карту и выделяет клетки, изменившиеся с прошлого хода"""
+        if self.current_turn == 0:
+            return
+        previous = self.prefetcher.take(self.current_turn - 1) or self.prepare_turn(self.current_turn - 1)
+        if previous is None:
+            return
+        diff = diff_turns(previous[1], self.current_players)
+
+        # Цвет рамки по виду изменения; позже в списке - важнее
+        marks = {}
+        for _, old, new in diff.flags_changed():
+            marks[(new[1], new[2])] = (80, 160, 255)  # Изменились флаги
+        for _, old, new in diff.moved():
+            marks[(old[1], old[2])] = (255, 160, 0)  # Откуда ушли
+            marks[(new[1], new[2])] = (255, 230, 0)  # Куда пришли
+        for _, obj in diff.destroyed():
+            marks[(obj[1], obj[2])] = (255, 0, 0)
+        for _, obj in diff.created():
+            marks[(obj[1], obj[2])] = (0, 220, 0)
+
+        shade = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+        shade.fill((0, 0, 0, 110))
+        rects = [(self.cell_screen_rect(x, y), color) for (x, y), color in marks.items()]
+        for rect, _ in rects:
+            shade.fill((0, 0, 0, 0), rect)
+        surface.blit(shade, (0, 0))
+        for rect, color in rects:
+            pygame.draw.rect(surface, color, rect, 2)
+
+    def render_state(self):
+        """Данные для отрисовки ходов без окна в других процессах.
+
+        Пиксели канвы сюда не входят: их передают отдельно, через общую память.
+        """
+        return {
+            'game_dir': self.game_dir,
+            'turns': dict(self.game.turns),
+            'map_size': (self.map_width, self.map_height),
+            'field_bounds': self.field_bounds,
+            'canvas_size': (self.canvas_width, self.canvas_height),
+            'game_objects': self.game_objects,
+            'icon_indices': self.icon_indices,
+            'army_icons': [(pygame.image.tostring(icon, 'RGBA'), icon.get_size())
+                           for icon in self.army_icons],
+            'mine_icons': [(pygame.image.tostring(icon, 'RGBA'), icon.get_size())
+                           for icon in self.mine_icons],
+        }
+
+    @classmethod
+    def from_render_state(cls, state, canvas, width=None):
+        """Экземпляр без окна, умеющий только разбирать и рисовать ходы"""
+        self = cls.__new__(cls)
+        self.game_dir = state['game_dir']
+        self.game = GameEntry(self.game_dir, turns=state['turns'])
+        self.map_width, self.map_height = state['map_size']
+        self.field_bounds = state['field_bounds']
+        self.canvas_width, self.canvas_height = state['canvas_size']
+        self.game_objects = state['game_objects']
+        self.icon_indices = state['icon_indices']
+        self.army_icons = [pygame.image.fromstring(data, size, 'RGBA')
+                           for data, size in state['army_icons']]
+        self.mine_icons = [pygame.image.fromstring(data, size, 'RGBA')
+                           for data, size in state['mine_icons']]
+        self.sprite_atlas = SpriteAtlas(self.army_icons, self.mine_icons, self.icon_indices)
+        self.parse_reports = ParseReports()
+        self.turn_cache = TurnCache(self.game_dir, self.parse_turn_content)
+
+        self.canvas = canvas
+        width = width or self.canvas_width
+        height = int(width * self.canvas_height / self.canvas_width)
+        self.scaled_canvas = canvas if width == self.canvas_width else \
+            pygame.transform.scale(canvas, (width, height))
+        self.screen_width = width
+        self.zoom = 1.0
+        return self
+
+    def render_turn_surface(self, turn):
+        """Отрисовывает ход на отдельной поверхности (карта и объекты)"""
+        turn_file = self.find_turn_file(turn)
+        if not turn_file:
+            return None
+        objects, _, warnings = self.turn_cache.get(turn_file)
+        self.parse_reports.record(turn, turn_file, warnings)
+        surface = pygame.Surface(self.scaled_canvas.get_size())
+        self.draw_canvas(surface)
+        self.draw_game_objects(objects, surface)
+        return surface
+
+    @timed('render_frame')
+    def render_frame(self, hover):
+        """Перерисовывает только изменившиеся слои, возвращает грязные области"""
+        dirty_rects = []
+
+        # Открытая панель замеров обновляется дважды в секунду
+        if self.show_timings and time.perf_counter() - self.timings_drawn_at > 0.5:
+            hover = True
+
+        # Статический слой кэшируется на ход, размер окна, вид карты и режим изменений
+        static_key = (self.current_turn, self.screen_width, self.screen_height,
+                      self.zoom, self.view_center, self.diff_mode, self.show_regions,
+                      self.show_heatmap and self.heatmap_range(),
+                      self.show_tracks and (self.track_length, self.heatmap_range()[0],
+                                            len(self.history) > self.current_turn))
+        if self.static_key != static_key:
+            rects = None
+            # При смене хода в том же окне перерисовываем только изменившиеся клетки
+            if (self.static_key is not None and self.static_key[1:] == static_key[1:]
+                    and not (self.diff_mode or self.show_regions or self.show_heatmap
+                             or self.show_tracks)):
+                rects = self.update_static_layer()
+            if rects is None:
+                self.build_static_layer()
+                rects = [self.static_layer.get_rect()]
+            self.static_key = static_key
+            self.static_players = self.current_players
+            for rect in rects:
+                self.screen.blit(self.static_layer, rect.topleft, rect)
+            dirty_rects.extend(rects)
+            hover = True
+
+        if hover:
+            # Стираем прошлый оверлей, восстанавливая его области из статического слоя
+            map_rect = self.static_layer.get_rect()
+            for rect in self.overlay_rects:
+                clipped = rect.clip(map_rect)
+                self.screen.blit(self.static_layer, clipped.topleft, clipped)
+                if rect.bottom > map_rect.bottom:
+                    self.panel_dirty = True
+            dirty_rects.extend(self.overlay_rects)
+
+        # Панель перерисовывается только при изменении ее содержимого
+        if self.panel_dirty:
+            self.draw_interface()
+            self.panel_dirty = False
+            dirty_rects.append(pygame.Rect(0, self.panel_y, self.screen_width,
+                                           self.screen_height - self.panel_y))
+
+        if hover:
+            mouse_pos = pygame.mouse.get_pos()
+            self.hovered = self.hover_key(mouse_pos)
+            self.overlay_rects = [rect.copy() for rect in self.draw_cell_highlight(mouse_pos)]
+            if self.show_timings:
+                self.overlay_rects.append(self.draw_timings())
+            if self.show_stats:
+                self.overlay_rects.append(self.draw_stats_chart())
+            if self.show_catalog:
+                self.overlay_rects.append(self.draw_catalog())
+            dirty_rects.extend(self.overlay_rects)
+
+        return dirty_rects
+
+    def draw_timings(self):
+        """Панель процентилей времени этапов у нижнего края окна, над панелью игроков"""
+        if not hasattr(self, 'timings_font'):
+            self.timings_font = pygame.font.SysFont('couriernew,dejavusansmono,monospace', 14)
+        self.timings_drawn_at = time.perf_counter()
+        return draw_timings_hud(self.screen, self.timings, self.timings_font,
+                                pygame.Rect(0, 0, self.screen_width, self.screen_height))
+
+    def draw_catalog(self):
+        """Окно выбора игры: миниатюры карт с заголовками и числом ходов"""
+        thumb_width, padding = 160, 10
+        games = self.catalog.entries()
+        for entry in games:
+            if entry.path not in self.catalog_thumbnails:
+                self.catalog_thumbnails[entry.path] = self.catalog.thumbnail(entry, thumb_width)
+
+        line_height = self.font.get_linesize()
+        thumb_height = max((thumb.get_height() for thumb in self.catalog_thumbnails.values()
+                            if thumb is not None), default=thumb_width // 2)
+        card_width = thumb_width + padding * 2
+        card_height = thumb_height + line_height * 2 + padding * 2
+        viewport = self.map_viewport()
+        columns = max(1, min(len(games), (viewport.width - padding) // (card_width + padding)))
+        rows = (len(games) + columns - 1) // columns
+        panel = pygame.Rect(0, 0, columns * (card_width + padding) + padding,
+                            rows * (card_height + padding) + padding)
+        panel.center = viewport.center
+        panel = panel.clip(viewport)
+
+        background = pygame.Surface(panel.size, pygame.SRCALPHA)
+        background.fill((0, 0, 0, 200))
+        self.screen.blit(background, panel)
+        self.screen.set_clip(panel)
+        self.catalog_rects = []
+        for number, entry in enumerate(games):
+            card = pygame.Rect(panel.x + padding + (number % columns) * (card_width + padding),
+                               panel.y + padding + (number // columns) * (card_height + padding),
+                               card_width, card_height)
+            current = entry.path == self.game.path
+            pygame.draw.rect(self.screen, (90, 90, 90) if current else (50, 50, 50), card)
+            thumb = self.catalog_thumbnails.get(entry.path)
+            if thumb is not None:
+                self.screen.blit(thumb, (card.x + padding, card.y + padding))
+            text_y = card.y + padding + thumb_height
+            for line in (entry.title or os.path.basename(entry.path),
+                         f"{entry.width}x{entry.height}, ходов: {len(entry.turns)}"):
+                self.screen.blit(self.font.render(line, True, (255, 255, 255)), (card.x + padding, text_y))
+                text_y += line_height
+            if current:
+                pygame.draw.rect(self.screen, (255, 230, 0), card, 2)
+            self.catalog_rects.append((card, entry))
+        self.screen.set_clip(None)
+        return panel
+
+    def current_stats(self):
+        """Статистика по построенной части истории; пересчитывается, когда история меняется"""
+        key = (id(self.history), len(self.history), self.history.offsets[-1])
+        if self.stats_key != key:
+            self.stats = PlayerStats(self.history)
+            self.stats_key = key
+        return self.stats
+
+    def export_stats(self):
+        """Выгрузка статистики всех построенных ходов в CSV"""
+        type_names = {char: name for char, (name, _) in self.game_objects.items()}
+        try:
+            self.current_stats().write_csv(self.stats_path, type_names)
+        except OSError as e:
+            logger.error("Статистика не сохранена: %s", e)
+
+    def draw_stats_chart(self):
+        """График выбранной величины по ходам: линия на игрока, отметка текущего хода"""
+        viewport = self.map_viewport()
+        panel = pygame.Rect(0, 0, viewport.width - 20, max(120, viewport.height * 2 // 5))
+        panel.midbottom = (viewport.centerx, viewport.bottom - 10)
+        panel = panel.clip(viewport)
+        stats = self.current_stats()
+        title, metric = STATS_METRICS[self.stats_metric]
+        plot = panel.inflate(-20, -20)
+        plot.top += self.font.get_linesize()
+        plot.height -= self.font.get_linesize()
+
+        # Линии игроков меняются только вместе с историей, величиной и размером
+        chart_key = (self.stats_key, self.stats_metric, panel.size)
+        if self.stats_chart_key != chart_key:
+            chart = pygame.Surface(panel.size, pygame.SRCALPHA)
+            chart.fill((0, 0, 0, 200))
+            values = metric(stats) if stats.turns else None
+            top = max(1, int(values.max())) if values is not None and values.size else 1
+            label = self.font.render(f"{title} (макс. {top}), ходов: {stats.turns}",
+                                     True, (255, 255, 255))
+            chart.blit(label, (10, 5))
+            if values is not None and stats.turns > 1:
+                local = plot.move(-panel.x, -panel.y)
+                xs = local.left + np.arange(stats.turns) * (local.width - 1) / (stats.turns - 1)
+                ys = local.bottom - 1 - np.clip(values, 0, None) * (local.height - 1) / top
+                for player in range(values.shape[1]):
+                    turns = np.flatnonzero(stats.present[:, player])
+                    if len(turns) < 2:
+                        continue
+                    points = np.column_stack((xs[turns], ys[turns, player])).tolist()
+                    pygame.draw.lines(chart, bgr_to_rgb(stats.player_color(player)), False, points, 2)
+            self.stats_chart = chart
+            self.stats_chart_key = chart_key
+
+        self.screen.blit(self.stats_chart, panel)
+        if stats.turns > 1:
+            x = plot.left + (plot.width - 1) * min(self.current_turn, stats.turns - 1) // (stats.turns - 1)
+            pygame.draw.line(self.screen, (255, 255, 255), (x, plot.top), (x, plot.bottom - 1))
+        return panel
+
+    def catalog_entry_at(self, pos):
+        for rect, entry in self.catalog_rects:
+            if rect.collidepoint(pos):
+                return entry
+        return None
+
+    def slider_turn(self, x):
+        """Ход под точкой ползунка"""
+        share = (x - self.slider_rect.left) / max(self.slider_rect.width, 1)
+        return min(self.max_turn, max(0, round(share * self.max_turn)))
+
+    def scrub_to(self, turn):
+        """Быстрый показ хода из истории при перетаскивании ползунка.
+
+        Индекс клеток (нужен только подсказкам) строится, когда ползунок
+        отпущен; до тех пор подсказки пусты.
+        """
+        if turn == self.current_turn or not self.history.has(turn):
+            return False
+        self.current_turn = turn
+        self.current_turn_objects, self.current_players = self.history.turn_players(turn)
+        if self.empty_cell_index is None:
+            self.empty_cell_index = CellIndex(self.map_width, self.map_height, [], {})
+        self.cell_index = self.empty_cell_index
+        self.panel_dirty = True
+        return True
+
+    def switch_game(self, game_dir):
+        """Переключение на другую игру без перезапуска"""
+        self.open_game(game_dir)
+        self.selected_player = None
+        logger.info("Открыта игра %s (%s)", self.game.title, self.game_dir)
+
+    def check_game_files(self):
+        """Учитывает файлы игры, изменившиеся на диске.
+
+        Новые и измененные ходы регистрируются в записи каталога, из кэшей
+        убираются только они. Изменение ANT.DAT или MAP.BMP перезагружает
+        игру целиком. Возвращает True, если показанный ход нужно перечитать.
+        """
+        if self.watcher is None:
+            return False
+        changed = self.watcher.poll()
+        if not changed:
+            return False
+
+        reload_current = False
+        reopen = False
+        for name in sorted(changed):
+            turn = self.game.register_file(name)
+            if turn is not None:
+                logger.info("Ход %d обновлен: %s", turn, name)
+                self.turn_cache.invalidate(os.path.join(self.game_dir, name))
+                self.prefetcher.invalidate(turn)
+                self.history.truncate(turn)
+                self.region_surfaces.pop(turn, None)
+                # Режим изменений сравнивает с предыдущим ходом
+                if turn == self.current_turn or (self.diff_mode and turn == self.current_turn - 1):
+                    reload_current = True
+            elif name.lower() in ('ant.dat', 'map.bmp'):
+                reopen = True
+
+        if reopen:
+            logger.info("Изменились файлы карты, игра %s перезагружается", self.game_dir)
+            turn = self.current_turn
+            try:
+                self.catalog.add(self.game_dir)
+            except FileNotFoundError as e:
+                logger.error("%s", e)
+                return reload_current
+            self.catalog_thumbnails.pop(self.game_dir, None)
+            self.open_game(self.game_dir)
+            self.current_turn = min(turn, self.max_turn)
+            return True
+
+        previous_max = self.max_turn
+        self.max_turn = self.game.max_turn
+        self.history_builder.start(self.max_turn)
+        self.panel_dirty = True
+        if self.follow_latest and self.max_turn > previous_max:
+            self.current_turn = self.max_turn
+            reload_current = True
+        elif self.current_turn > self.max_turn:
+            self.current_turn = self.max_turn
+            reload_current = True
+        if reload_current:
+            self.invalidate_layers()
+        return reload_current
+
+    def wake(self):
+        """Будит цикл событий; вызывается из фоновых потоков"""
+        if self.wake_pending.is_set():
+            return
+        self.wake_pending.set()
+        try:
+            pygame.event.post(pygame.event.Event(WAKE_EVENT))
+        except pygame.error:
+            # Окно уже закрыто
+            pass
+
+    def next_events(self, busy):
+        """Накопившиеся события; если их нет и делать нечего - спит до первого"""
+        events = pygame.event.get()
+        if events or busy:
+            return events
+        if self.show_timings:
+            # Открытая панель замеров обновляется дважды в секунду
+            event = pygame.event.wait(500)
+        else:
+            event = pygame.event.wait()
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def apply_motion(self, pos):
+        """Последнее положение мыши из пачки MOUSEMOTION; True, если нужен оверлей"""
+        if self.slider_drag:
+            self.scrub_to(self.slider_turn(pos[0]))
+        elif self.drag_start is not None:
+            self.pan_to(pos)
+        else:
+            # Движение внутри клетки не меняет ни подсветку, ни подсказку
+            return self.hover_key(pos) != self.hovered
+        return True
 
     def run(self):
         running = True
         change_turn = True
-        redraw = True
+        hover = True
+        clock = pygame.time.Clock()
         while running:
-            for event in pygame.event.get():
+            motion = None
+            for event in self.next_events(change_turn or hover):
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.MOUSEMOTION:
-                    redraw = True
+                    # Пачка движений обрабатывается один раз, по последнему положению
+                    motion = event.pos
+                elif event.type == WAKE_EVENT:
+                    # Фоновая задача: новый ход в истории, готовый сосед, файлы игры
+                    self.wake_pending.clear()
+                    if len(self.history) != self.slider_loaded:
+                        self.panel_dirty = True
+                elif event.type == pygame.VIDEOEXPOSE:
+                    # Окно было закрыто другим - кадр выводится целиком
+                    pygame.display.flip()
+                elif event.type == pygame.MOUSEWHEEL:
+                    # Увеличение относительно точки под курсором
+                    mouse_pos = pygame.mouse.get_pos()
+                    if self.map_viewport().collidepoint(mouse_pos):
+                        hover = True
+                        self.zoom_at(mouse_pos, ZOOM_STEP ** event.y)
+                elif event.type == pygame.MOUSEBUTTONUP:
+                    if motion is not None:
+                        hover = self.apply_motion(motion) or hover
+                        motion = None
+                    if event.button == 1:
+                        self.drag_start = None
+                        # Ползунок отпущен - ход загружается полностью, с индексом клеток
+                        if self.slider_drag:
+                            self.slider_drag = False
+                            change_turn = True
                 elif event.type == pygame.VIDEORESIZE:
-                    redraw = True
+                    hover = True
                     # Запоминаем текущие размеры окна
                     self.handle_resize(event.w, event.h)
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    redraw = True
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_c:
+                        # Режим изменений с прошлого хода
+                        self.diff_mode = not self.diff_mode
+                    elif event.key == pygame.K_r:
+                        # Контроль регионов по строениям хода
+                        self.show_regions = not self.show_regions
+                    elif event.key == pygame.K_h:
+                        # Тепловая карта войск выбранного игрока (или всех)
+                        self.show_heatmap = not self.show_heatmap
+                    elif event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET):
+                        # Короче / длиннее диапазон ходов тепловой карты
+                        step = -1 if event.key == pygame.K_LEFTBRACKET else 1
+                        self.heat_span = min(max(1, self.heat_span + step), self.max_turn + 1)
+                    elif event.key == pygame.K_t:
+                        # Пути войск, восстановленные по истории
+                        self.show_tracks = not self.show_tracks
+                    elif event.key == pygame.K_w:
+                        # Отчет о разборе показанного хода
+                        logger.warning("%s", self.parse_reports.format(self.current_turn))
+                    elif event.key == pygame.K_l:
+                        # Переходить ли на новый ход, как только он появится
+                        self.follow_latest = not self.follow_latest
+                        logger.info("Переход на новые ходы: %s",
+                                    "включен" if self.follow_latest else "выключен")
+                        if self.follow_latest and self.current_turn != self.max_turn:
+                            self.current_turn = self.max_turn
+                            change_turn = True
+                    elif event.key == pygame.K_HOME:
+                        # Вернуть карту, вписанную в окно
+                        self.zoom = 1.0
+                        self.view_center = None
+                    elif event.key == pygame.K_g:
+                        # Окно выбора игры
+                        self.show_catalog = not self.show_catalog
+                        hover = True
+                    elif event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                        # Предыдущая / следующая игра каталога
+                        step = -1 if event.key == pygame.K_PAGEUP else 1
+                        entry = self.catalog.neighbour(self.game_dir, step)
+                        if entry is not None and entry.path != self.game_dir:
+                            self.switch_game(entry.path)
+                            change_turn = True
+                            hover = True
+                    elif event.key == pygame.K_s:
+                        # График статистики игроков
+                        self.show_stats = not self.show_stats
+                        hover = True
+                    elif event.key == pygame.K_m:
+                        # Следующая величина графика
+                        self.stats_metric = (self.stats_metric + 1) % len(STATS_METRICS)
+                        hover = True
+                    elif event.key == pygame.K_e:
+                        self.export_stats()
+                    elif event.key == pygame.K_F3:
+                        # Панель замеров этапов
+                        self.show_timings = not self.show_timings
+                        hover = True
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    hover = True
                     mouse_pos = pygame.mouse.get_pos()
-                    button_rects = self.draw_interface()
+                    # Открыто окно выбора игры: клик выбирает игру или закрывает окно
+                    if self.show_catalog:
+                        entry = self.catalog_entry_at(mouse_pos)
+                        self.show_catalog = False
+                        if entry is not None and entry.path != self.game_dir:
+                            self.switch_game(entry.path)
+                            change_turn = True
+                        continue
+                    # Нажатие на ползунок начинает прокрутку ходов
+                    if self.slider_rect is not None and \
+                            self.slider_rect.inflate(0, 16).collidepoint(mouse_pos):
+                        self.slider_drag = True
+                        self.scrub_to(self.slider_turn(mouse_pos[0]))
+                        continue
+                    # Нажатие на карте начинает перетаскивание увеличенного вида
+                    if self.zoom > 1 and self.map_viewport().collidepoint(mouse_pos):
+                        self.drag_start = (mouse_pos, self.view_center)
+                    # Кнопки берутся с панели в ее нынешнем виде: до первой отрисовки
+                    # (и после смены игры или хода в той же пачке событий) их еще нет
+                    if self.panel_dirty or len(self.button_rects) < 2:
+                        self.draw_interface()
+                        self.panel_dirty = True
+                    button_rects = self.button_rects
                     # Проверяем клик по кнопкам навигации
                     if button_rects[0].collidepoint(mouse_pos):  # Предыдущий ход
                         change_turn = True
-                        redraw = True
                         self.current_turn = max(0, self.current_turn - 1)
                     elif button_rects[1].collidepoint(mouse_pos):  # Следующий ход
                         change_turn = True
-                        redraw = True
                         self.current_turn = min(self.max_turn, self.current_turn + 1)
                     
                     # Проверяем клик по прямоугольникам игроков
                     for i in range(2, len(button_rects)):
                         if button_rects[i].collidepoint(mouse_pos):
-                            self.selected_player = self.current_players[i-2]
+                            self.selected_player = self.player_rects[i-2][1]
+                            self.panel_dirty = True
                             break
 
-            # Отрисовка всего интерфейса
+            if motion is not None:
+                hover = self.apply_motion(motion) or hover
+
+            # Новые файлы ходов в директории игры
+            if self.check_game_files():
+                change_turn = True
+                hover = True
+
+            # Отрисовка изменившихся слоев интерфейса
             if change_turn:
-                turn_objects = self.load_turn_data(self.current_turn)
-            if redraw:
-                self.screen.fill((255, 255, 255))
-                self.draw_canvas()
-                self.draw_game_objects(turn_objects)
-                self.draw_interface()
+                self.current_turn_objects = self.load_turn_data(self.current_turn)
+                self.panel_dirty = True
+            dirty_rects = self.render_frame(hover)
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
             change_turn = False
-            redraw = False
-            pygame.display.flip()
-        
+            hover = False
+            # Во время работы с окном кадров не больше FRAME_RATE; после простоя tick не ждет
+            clock.tick(FRAME_RATE)
+        
+        self.prefetcher.shutdown()
+        self.history_builder.stop()
+        if self.watcher is not None:
+            self.watcher.close()
+        if self.replay is not None:
+            self.replay.close()
+        try:
+            self.timings.dump(self.timings_path)
+            logger.info("Замеры этапов сохранены в %s", self.timings_path)
+        except OSError as e:
+            logger.warning("Замеры этапов не сохранены: %s", e)
         pygame.quit()
     
     def handle_click(self, pos):
@@ -651,91 +1472,47 @@ class MapVisualizer:
         return False
     
     def find_max_turn(self):
-        max_turn = 0
-        # Ищем файлы ходов в игровой директории с учетом обоих вариантов именования
-        for file in os.listdir(self.game_dir):
-            # Проверяем оба варианта именования
-            year_match = re.search(r'[Гг]од(\d+)\.svs', file, re.IGNORECASE)
-            alt_match = re.search(r'®¤(\d+)\.svs', file, re.IGNORECASE)
-            
-            if year_match:
-                try:
-                    turn = int(year_match.group(1))
-                    max_turn = max(max_turn, turn)
-                except ValueError:
-                    continue
-            elif alt_match:
-                try:
-                    turn = int(alt_match.group(1))
-                    max_turn = max(max_turn, turn)
-                except ValueError:
-                    continue
-        return max_turn
+        return self.game.max_turn
 
     def calculate_cell_size(self):
         # Учитываем границы карты при расчете размера клетки
-        playable_width = self.original_background.get_width() - 2  # Вычитаем границы слева и справа
-        playable_height = self.original_background.get_height() - 2  # Вычитаем границы сверху и снизу
+        playable_width = self.map_image.width - 2  # Вычитаем границы слева и справа
+        playable_height = self.map_image.height - 2  # Вычитаем границы сверху и снизу
         return min(playable_width / 120, playable_height / 60)
 
-    def read_map_dimensions(self):
+    def load_map_model(self):
+        """Читает ANT.DAT в модель карты и устанавливает заголовок окна"""
         try:
-            ant_file = self.find_file('ANT.DAT')
-            with open(ant_file, 'rb') as file:
-                content = file.read()
-                # Пробуем разные кодировки
-                for encoding in ['cp1251', 'cp866', 'utf-8']:
-                    try:
-                        text = content.decode(encoding)
-                        lines = text.split('\n')
-                        
-                        # Читаем заголовок и устанавливаем его в окно
-                        title = lines[0].strip('[]').strip()
-                        pygame.display.set_caption(title)
-                        
-                        # Читаем размеры карты
-                        width = int(lines[1].strip())
-                        height = int(lines[2].strip())
-                        
-                        return width, height
-                    except UnicodeDecodeError:
-                        continue
-                
-                raise UnicodeDecodeError("Не удалось декодировать файл ANT.DAT")
-                
-        except (FileNotFoundError, ValueError, IndexError) as e:
-            print(f"Ошибка чтения карты: {e}")
-            return 130, 57
-
-    def find_game_directory(self):
-        """Поиск директории с игровыми файлами"""
-        # Проверяем текущую директорию
-        if os.path.exists('ANT.DAT'):
-            self.game_dir = '.'
-            return self.game_dir
-            
-        # Ищем в поддиректориях
-        for dir_entry in os.scandir('.'):
-            if dir_entry.is_dir():
-                ant_path = os.path.join(dir_entry.path, 'ANT.DAT')
-                if os.path.exists(ant_path):
-                    self.game_dir = dir_entry.path
-                    return self.game_dir
-        raise FileNotFoundError("Не найдена директория с игровыми файлами")
+            self.map_model = AntDat.load(self.find_file('ANT.DAT'))
+        except (OSError, ValueError, IndexError) as e:
+            logger.error("Ошибка чтения карты: %s", e)
+            self.map_model = AntDat('', 130, 57)  # Значения по умолчанию
+        for warning in self.map_model.warnings:
+            logger.warning("ANT.DAT: %s", warning)
+        if self.map_model.title:
+            pygame.display.set_caption(self.map_model.title)
+        self.map_width = self.map_model.width
+        self.map_height = self.map_model.height
+        return self.map_model
+
+    def find_game_directory(self, game_dir=None):
+        """Выбор игры из каталога: указанной явно или первой найденной"""
+        if game_dir is not None:
+            self.game = self.catalog.get(game_dir) or self.catalog.add(game_dir)
+        else:
+            games = self.catalog.entries()
+            if not games:
+                raise FileNotFoundError("Не найдена директория с игровыми файлами")
+            self.game = games[0]
+        self.game_dir = self.game.path
+        return self.game_dir
 
     def find_file(self, filename):
-        """Ищет файл независимо от регистра букв в имени"""
-        # Проверяем в игровой директории
-        game_path = os.path.join(self.game_dir, filename)
-        if os.path.exists(game_path):
-            return game_path
-            
-        # Ищем файл в разных регистрах
-        for file in os.listdir(self.game_dir):
-            if file.lower() == filename.lower():
-                return os.path.join(self.game_dir, file)
-                
-        raise FileNotFoundError(f"Файл {filename} не найден")
+        """Ищет файл игры независимо от регистра букв в имени"""
+        path = self.game.file_path(filename)
+        if path is None:
+            raise FileNotFoundError(f"Файл {filename} не найден")
+        return path
 
     def draw_grid(self):
         """Отрисовывает сетку игрового поля"""
@@ -749,7 +1526,7 @@ class MapVisualizer:
             # Определяем цвет линии
             color_index = [170, 140, 110, 80, 50][x % 5]
             x_pos = left + x * self.cell_width
-            pygame.draw.line(self.debug_surface, 
+            pygame.draw.line(self.canvas, 
                            (color_index, color_index, color_index),  # Серый цвет
                            (x_pos, top), 
                            (x_pos, top + height),
@@ -760,304 +1537,43 @@ class MapVisualizer:
             # Определяем цвет линии
             color_index = [170, 140, 110, 80, 50][y % 5]
             y_pos = top + y * self.cell_height
-            pygame.draw.line(self.debug_surface,
+            pygame.draw.line(self.canvas,
                            (color_index, color_index, color_index),  # Серый цвет
                            (left, y_pos),
                            (left + width, y_pos),
                            1)  # Толщина линии
 
-    def find_left_border(self):
-        """Поиск левой границы игрового поля по черно-белому паттерну"""
-        # Получаем массив пикселей
-        pixel_array = pygame.surfarray.array3d(self.original_background)
-        height = self.original_background.get_height()
-        
-        # Создаем копию фона для визуализации
-        debug_surface = self.original_background.copy()
-        
-        # Начинаем с середины высоты изображения
-        mid_height = height // 2
-        scan_height = 5  # Высота области сканирования
-        start_y = mid_height - scan_height // 2
-        
-        def is_black(color):
-            return all(c < 30 for c in color)
-            
-        def is_white(color):
-            return all(c > 225 for c in color)
-            
-        def find_pattern_in_row(y):
-            black_count = 0
-            white_count = 0
-            pattern_start = None
-            
-            # Сканируем от 50-го пикселя к левому краю
-            for x in range(50, -1, -1):
-                color = tuple(pixel_array[x][y])  # Преобразуем в кортеж для вывода
-                
-                # Отрисовываем точку проверки
-                debug_surface.set_at((x, y), (255, 0, 0))  # Красная точка
-                self.screen.blit(debug_surface, (2, 2))
-                pygame.display.flip()
-                pygame.time.delay(10)  # Небольшая задержка для визуализации
-                
-                # Логируем проверку цвета
-                is_black_pixel = is_black(color)
-                is_white_pixel = is_white(color)
-                # print(f"x={x}, y={y}, цвет={color}, ")
-                # print(f"    черный={is_black_pixel} (нужно < 30 для всех компонент)")
-                # print(f"    белый={is_white_pixel} (нужно > 225 для всех компонент)")
-                
-                if is_black_pixel:
-                    black_count += 1
-                    if 3 <= black_count <= 10:
-                        # print(f"Найден черный паттерн длиной {black_count}")
-                        # Отмечаем найденный паттерн зелеными точками
-                        for i in range(x, x + black_count):
-                            debug_surface.set_at((i, y), (0, 255, 0))
-                        # Отрисовываем вертикальную салатовую линию на правой границе паттерна
-                        border_x = x + black_count
-                        for y_line in range(height):
-                            debug_surface.set_at((border_x, y_line), (144, 238, 144))  # Салатовый цвет
-                        self.screen.blit(debug_surface, (2, 2))
-                        pygame.display.flip()
-                        return border_x, black_count
-                    if white_count > 0:
-                        white_count = 0
-                elif is_white_pixel:
-                    white_count += 1
-                    if 3 <= white_count <= 10:
-                        # print(f"Найден белый паттерн длиной {white_count}")
-                        # Отмечаем найденный паттерн зелеными точками
-                        for i in range(x, x + white_count):
-                            debug_surface.set_at((i, y), (0, 255, 0))
-                        # Отрисовываем вертикальную салатовую линию на правой границе паттерна
-                        border_x = x + white_count
-                        for y_line in range(height):
-                            debug_surface.set_at((border_x, y_line), (144, 238, 144))  # Салатовый цвет
-                        self.screen.blit(debug_surface, (2, 2))
-                        pygame.display.flip()
-                        return border_x, white_count
-                    if black_count > 0:
-                        black_count = 0
-        
-        # Ищем паттерн в области сканирования
-        for y in range(start_y, start_y + scan_height):
-            border_x, segment_size = find_pattern_in_row(y)
-            if border_x is not None:
-                print(f"Найдена левая граница: x={border_x}, размер сегмента={segment_size}")
-                return border_x, segment_size
-        
-        print("Левая граница не найдена")
-        return None, None
-
     def find_game_borders(self):
-        """Поиск всех границ игрового поля"""
-        # Создаем копию фона для визуализации
-        self.debug_surface = self.original_background.copy()
-        
-        # Находим все границы
-        left_x, _ = self.find_left_border()
-        right_x, _ = self.find_right_border()
-        top_y, _ = self.find_top_border()
-        bottom_y, _ = self.find_bottom_border()
-        
-        if all(x is not None for x in [left_x, right_x, top_y, bottom_y]):
-            self.field_bounds = (left_x, top_y, right_x - left_x, bottom_y - top_y)
-            print(f"Найдены границы поля: {self.field_bounds}")
-            
-            # Вычисляем размеры клеток и рисуем сетку
-            if self.calculate_field_cells():
-                self.draw_grid()
-                # Обновляем канву с отладочной информацией
-                self.canvas = self.debug_surface.copy()
-                self.scaled_canvas = pygame.transform.scale(
-                    self.canvas,
-                    (self.scaled_canvas.get_width(), self.scaled_canvas.get_height())
-                )
-        else:
-            print("Не удалось найти все границы поля")
-
-    def find_right_border(self):
-        """Поиск правой границы игрового поля"""
-        pixel_array = pygame.surfarray.array3d(self.original_background)
-        height = self.original_background.get_height()
-        width = self.original_background.get_width()
-        
-        mid_height = height // 2
-        scan_height = 5
-        start_y = mid_height - scan_height // 2
-        
-        def is_black(color):
-            return all(c < 30 for c in color)
-            
-        def is_white(color):
-            return all(c > 225 for c in color)
-        
-        def find_pattern_in_row(y):
-            black_count = white_count = 0
-            
-            # Сканируем от центра к правому краю (изменено направление)
-            for x in range(width - 50, width):  # Начинаем с width-50 и идем к правому краю
-                color = tuple(pixel_array[x][y])
-                
-                # Отрисовываем точку проверки
-                self.debug_surface.set_at((x, y), (255, 0, 0))
-                self.screen.blit(self.debug_surface, (2, 2))
-                pygame.display.flip()
-                pygame.time.delay(10)
-                
-                is_black_pixel = is_black(color)
-                is_white_pixel = is_white(color)
-                
-                if is_black_pixel:
-                    black_count += 1
-                    if 3 <= black_count <= 10:
-                        for i in range(x - black_count + 1, x + 1):  # Отмечаем паттерн
-                            self.debug_surface.set_at((i, y), (0, 255, 0))
-                        border_x = x - black_count + 1  # Граница - начало паттерна
-                        for y_line in range(height):
-                            self.debug_surface.set_at((border_x, y_line), (144, 238, 144))
-                        return border_x, black_count
-                    white_count = 0
-                elif is_white_pixel:
-                    white_count += 1
-                    if 3 <= white_count <= 10:
-                        for i in range(x - white_count + 1, x + 1):
-                            self.debug_surface.set_at((i, y), (0, 255, 0))
-                        border_x = x - white_count + 1
-                        for y_line in range(height):
-                            self.debug_surface.set_at((border_x, y_line), (144, 238, 144))
-                        return border_x, white_count
-                    black_count = 0
-                else:
-                    black_count = white_count = 0
-            
-            return None, None
+        """Поиск всех границ игрового поля и шага клеток по пиксельному буферу"""
+        # Поиск работает прямо по общему буферу пикселей карты, без копирования
+        borders = detect_field_borders(self.map_image.pixels)
 
-        for y in range(start_y, start_y + scan_height):
-            border_x, segment_size = find_pattern_in_row(y)
-            if border_x is not None:
-                return border_x, segment_size
-        
-        return None, None
+        if borders is None:
+            logger.warning("Не удалось найти все границы поля")
+            return
 
-    def find_top_border(self):
-        """Поиск верхней границы игрового поля"""
-        pixel_array = pygame.surfarray.array3d(self.original_background)
-        width = self.original_background.get_width()
-        
-        mid_width = width // 2
-        scan_width = 5
-        start_x = mid_width - scan_width // 2
-        
-        def is_black(color):
-            return all(c < 30 for c in color)
-            
-        def is_white(color):
-            return all(c > 225 for c in color)
-        
-        def find_pattern_in_column(x):
-            black_count = white_count = 0
-            
-            # Сканируем от центра к верхнему краю
-            for y in range(50, 0, -1):
-                color = tuple(pixel_array[x][y])
-                self.debug_surface.set_at((x, y), (255, 0, 0))
-                self.screen.blit(self.debug_surface, (2, 2))
-                pygame.display.flip()
-                pygame.time.delay(10)
-                
-                if is_black(color):
-                    black_count += 1
-                    if 3 <= black_count <= 10:
-                        for i in range(y, y + black_count):  # Отмечаем паттерн
-                            self.debug_surface.set_at((x, i), (0, 255, 0))
-                        border_y = y + black_count  # Граница - конец паттерна
-                        for x_line in range(width):
-                            self.debug_surface.set_at((x_line, border_y), (144, 238, 144))
-                        return border_y, black_count
-                    white_count = 0
-                elif is_white(color):
-                    white_count += 1
-                    black_count = 0
-                    if 3 <= white_count <= 10:
-                        for i in range(y, y + white_count):
-                            self.debug_surface.set_at((x, i), (0, 255, 0))
-                        border_y = y + white_count  # Граница - конец паттерна
-                        for x_line in range(width):
-                            self.debug_surface.set_at((x_line, border_y), (144, 238, 144))
-                        return border_y, white_count
-                    black_count = 0
-                else:
-                    black_count = white_count = 0
-            return None, None
+        self.field_bounds = (borders.left, borders.top,
+                             borders.right - borders.left, borders.bottom - borders.top)
 
-        for x in range(start_x, start_x + scan_width):
-            border_y, segment_size = find_pattern_in_column(x)
-            if border_y is not None:
-                return border_y, segment_size
-        
-        return None, None
+        # Если линейка рамки размечена по числу клеток карты, берем
+        # подогнанную сетку: она точнее деления ширины поля на число клеток
+        if (borders.cells_x == self.map_width and borders.cells_y == self.map_height
+                and borders.pitch_x and borders.pitch_y):
+            self.field_bounds = (borders.origin_x, borders.origin_y,
+                                 borders.pitch_x * self.map_width,
+                                 borders.pitch_y * self.map_height)
+        logger.debug("Найдены границы поля: %s", self.field_bounds)
 
-    def find_bottom_border(self):
-        """Поиск нижней границы игрового поля"""
-        pixel_array = pygame.surfarray.array3d(self.original_background)
-        width = self.original_background.get_width()
-        height = self.original_background.get_height()
-        
-        mid_width = width // 2
-        scan_width = 5
-        start_x = mid_width - scan_width // 2
-        
-        def is_black(color):
-            return all(c < 30 for c in color)
-            
-        def is_white(color):
-            return all(c > 225 for c in color)
-        
-        def find_pattern_in_column(x):
-            black_count = white_count = 0
-            
-            # Сканируем от центра к нижнему краю (изменено направление)
-            for y in range(height - 50, height):  # Начинаем с height-50 и идем к нижнему краю
-                color = tuple(pixel_array[x][y])
-                self.debug_surface.set_at((x, y), (255, 0, 0))
-                self.screen.blit(self.debug_surface, (2, 2))
-                pygame.display.flip()
-                pygame.time.delay(10)
-                
-                if is_black(color):
-                    black_count += 1
-                    if 3 <= black_count <= 10:
-                        for i in range(y - black_count + 1, y + 1):  # Отмечаем паттерн
-                            self.debug_surface.set_at((x, i), (0, 255, 0))
-                        border_y = y - black_count + 1  # Граница - начало паттерна
-                        for x_line in range(width):
-                            self.debug_surface.set_at((x_line, border_y), (144, 238, 144))
-                        return border_y, black_count
-                    white_count = 0
-                elif is_white(color):
-                    white_count += 1
-                    black_count = 0
-                    if 3 <= white_count <= 10:
-                        for i in range(y - white_count + 1, y + 1):
-                            self.debug_surface.set_at((x, i), (0, 255, 0))
-                        border_y = y - white_count + 1
-                        for x_line in range(width):
-                            self.debug_surface.set_at((x_line, border_y), (144, 238, 144))
-                        return border_y, white_count
-                    black_count = 0
-                else:
-                    black_count = white_count = 0
-            return None, None
+        if self.debug_borders:
+            draw_debug_marks(self.canvas, borders)
 
-        for x in range(start_x, start_x + scan_width):
-            border_y, segment_size = find_pattern_in_column(x)
-            if border_y is not None:
-                return border_y, segment_size
-        
-        return None, None
+        # Вычисляем размеры клеток и рисуем сетку прямо на канве
+        if self.calculate_field_cells():
+            self.draw_grid()
+            if self.scaled_canvas.get_size() == self.canvas.get_size():
+                self.scaled_canvas = self.canvas
+            else:
+                self.scaled_canvas = pygame.transform.scale(self.canvas, self.scaled_canvas.get_size())
 
     def calculate_field_cells(self):
         """Вычисляет размеры клеток на основе найденных границ поля"""
@@ -1066,30 +1582,18 @@ class MapVisualizer:
             # Вычисляем размеры клеток
             self.cell_width = width / self.map_width
             self.cell_height = height / self.map_height
-            print(f"Размеры клетки: {self.cell_width:.2f}x{self.cell_height:.2f} пикселей")
+            logger.debug("Размеры клетки: %.2fx%.2f пикселей", self.cell_width, self.cell_height)
             return True
         return False
 
     def get_cell_terrain(self, cell_x, cell_y):
-        """Получает тип местности в указанной клетке"""
-        if hasattr(self, 'terrain_map') and self.terrain_map:
-            if 0 <= cell_y < len(self.terrain_map) and 0 <= cell_x < len(self.terrain_map[0]):
-                terrain_code = self.terrain_map[cell_y][cell_x]
-                if terrain_code:
-                    return self.get_terrain_type(terrain_code)
-        return "неизвестно"
-
-    def get_terrain_type(self, code):
-        """Преобразует код местности в текстовое описание"""
-        terrain_types = {
-            'M': "горы",
-            'F': "лес",
-            'W': "вода",
-            'P': "равнина",
-            'S': "болото",
-            'D': "пустыня"
-        }
-        return terrain_types.get(code, "неизвестно")
+        """Получает регион в указанной клетке: название и доход"""
+        region = self.map_model.region(cell_x + 1, cell_y + 1)
+        if region is None:
+            return "неизвестно"
+        if region.income:
+            return f"{region.name}, доход {region.income}"
+        return region.name
 
     def get_terrain_info(self, terrain_type):
         """Возвращает описание типа местности"""
@@ -1106,49 +1610,19 @@ class MapVisualizer:
     
     def get_cell_buildings(self, cell_x, cell_y):
         """Получает список строений в указанной клетке"""
-        buildings = []
-        for obj in self.current_turn_objects:
-            if isinstance(obj, tuple) and len(obj) >= 3:
-                obj_type, x, y = obj[:3]
-                # Проверяем, является ли объект строением и находится ли в указанной клетке
-                if (x-1, y-1) == (cell_x, cell_y) and obj_type in 'КГЗПБCSGM':
-                    building_name = self.game_objects.get(obj_type, [obj_type])[0]
-                    buildings.append(building_name)
-        return buildings
+        return [obj.name for obj in self.cell_index.buildings(cell_x, cell_y)]
     
     def get_cell_armies(self, cell_x, cell_y):
         """Получает список армий в указанной клетке"""
-        armies = []
-        for obj in self.current_turn_objects:
-            if isinstance(obj, tuple) and len(obj) >= 3:
-                obj_type, x, y = obj[:3]
-                # Проверяем, является ли объект армией и находится ли в указанной клетке
-                if (x-1, y-1) == (cell_x, cell_y) and obj_type in 'гвэопрмзд':
-                    army_name = self.game_objects.get(obj_type, [obj_type])[0]
-                    armies.append(army_name)
-        return armies
+        return [obj.name for obj in self.cell_index.armies(cell_x, cell_y)]
     
     def get_building_owner(self, cell_x, cell_y, building_name):
         """Получает владельца строения"""
-        # Ищем владельца среди игроков
-        for player in self.current_players:
-            for obj in player.get('objects', []):
-                if isinstance(obj, tuple) and len(obj) >= 3:
-                    obj_type, x, y = obj[:3]
-                    if (x-1, y-1) == (cell_x, cell_y) and self.game_objects.get(obj_type, [obj_type])[0] == building_name:
-                        return player.get('name')
-        return None
+        return self.cell_index.owner(cell_x, cell_y, building_name)
     
     def get_army_owner(self, cell_x, cell_y, army_name):
         """Получает владельца армии"""
-        # Ищем владельца среди игроков
-        for player in self.current_players:
-            for obj in player.get('objects', []):
-                if isinstance(obj, tuple) and len(obj) >= 3:
-                    obj_type, x, y = obj[:3]
-                    if (x-1, y-1) == (cell_x, cell_y) and self.game_objects.get(obj_type, [obj_type])[0] == army_name:
-                        return player.get('name')
-        return None
+        return self.cell_index.owner(cell_x, cell_y, army_name)
 
     def check_system_encoding(self):
         self.system_encoding = locale.getpreferredencoding()
@@ -1156,20 +1630,19 @@ class MapVisualizer:
             self.system_encoding = 'cp1251'
 
     def load_background_map(self):
-        map_file = self.find_file('MAP.BMP')
-        self.original_background = pygame.image.load(map_file)
-        self.aspect_ratio = self.original_background.get_width() / self.original_background.get_height()
+        # Пиксели карты - общий буфер только для чтения, отображенный из файла
+        self.map_image = MapImage.open(self.find_file('MAP.BMP'))
+        self.aspect_ratio = self.map_image.width / self.map_image.height
     
     def prepare_canvas(self):
-        # Создаем одну поверхность для всего содержимого
-        self.canvas = self.original_background.copy()
-        self.canvas_width = self.original_background.get_width()
-        self.canvas_height = self.original_background.get_height()
-        # Создаем начальную масштабированную канву
-        self.scaled_canvas = self.canvas.copy()
+        # Канва - единственная изменяемая копия карты (на нее ляжет сетка)
+        self.canvas = self.map_image.surface()
+        self.canvas_width, self.canvas_height = self.map_image.size
+        # Пока окно размером с карту, масштабированная канва - та же поверхность
+        self.scaled_canvas = self.canvas
         
         # Простое определение границ игрового поля
-        width, height = self.original_background.get_width(), self.original_background.get_height()
+        width, height = self.map_image.size
         self.field_bounds = (0, 0, width, height)
         
         # Вычисляем размеры клетки отдельно по горизонтали и вертикали    
@@ -1199,8 +1672,42 @@ class MapVisualizer:
         # Инициализируем списки для хранения данных игроков
         self.current_players = []
         self.selected_player = None
+        # Пустой индекс клеток до загрузки первого хода
+        self.cell_index = CellIndex(self.map_width, self.map_height, [], {})
 
         self.player_rects = []
+        self.button_rects = []
+        # Ползунок ходов и его перетаскивание
+        self.slider_rect = None
+        self.slider_drag = False
+        self.slider_loaded = 0
+        self.empty_cell_index = None
+
+        # Слои отрисовки: статический (карта и объекты хода), оверлей
+        # (подсветка и подсказка) и панели
+        self.static_layer = None
+        self.static_key = None
+        self.static_players = []
+        self.overlay_rects = []
+        # Клетка под курсором при последней отрисовке оверлея (см. hover_key)
+        self.hovered = None
+        # Режим подсветки клеток, изменившихся с прошлого хода
+        self.diff_mode = False
+        # Слой контроля регионов и его поверхности по ходам
+        self.show_regions = False
+        self.region_surfaces = OrderedDict()
+        # Тепловая карта войск за heat_span ходов до показанного
+        self.show_heatmap = False
+        self.heat_span = 10
+        # Пути войск за track_length ходов до показанного
+        self.show_tracks = False
+        self.track_length = 5
+        # Увеличение карты и точка канвы в центре окна (None - карта вписана)
+        self.zoom = 1.0
+        self.view_center = None
+        # (позиция курсора, центр вида) в начале перетаскивания карты
+        self.drag_start = None
+        self.panel_dirty = True
         
         # Создаем окно с новыми размерами
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.RESIZABLE)
@@ -1264,6 +1771,14 @@ class MapVisualizer:
             'M': 3   # Мифрил
         }
 
+        # Атлас готовых спрайтов объектов для отрисовки хода
+        self.sprite_atlas = SpriteAtlas(self.army_icons, self.mine_icons, self.icon_indices)
+
 if __name__ == '__main__':
-    visualizer = MapVisualizer()
+    setup_logging(verbose='-v' in sys.argv or '--verbose' in sys.argv)
+    replay = sys.argv[sys.argv.index('--replay') + 1] if '--replay' in sys.argv[:-1] else None
+    visualizer = MapVisualizer(debug_borders='--debug-borders' in sys.argv,
+                               watch='--no-watch' not in sys.argv,
+                               follow_latest='--follow' in sys.argv,
+                               replay=replay)
     visualizer.run()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""Модель карты из ANT.DAT.
+
+Формат файла:
+
+    [epoha 30let]          заголовок
+    55                     ширина карты
+    38                     высота карты
+    [Land]
+    ,,,..BBBFFF...         height строк по width символов - код региона клетки
+    1 2 6,14 2,...         рудники: номер металла, затем пары x y через запятую
+    29                     число основных регионов
+    A                      тройки: код региона,
+    Альгарт                название,
+    5                      доход
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .svs_parser import detect_encoding
+
+# Номер металла в строке рудников -> тип объекта рудника
+MINE_TYPES = {1: 'C', 2: 'S', 3: 'G', 4: 'M'}
+# Коды морских клеток
+SEA_CODES = '.,^'
+
+Region = namedtuple('Region', 'code name income')
+
+
+class AntDat:
+    """ANT.DAT, разобранный один раз: сетка регионов, таблица регионов и рудники"""
+
+    def __init__(self, title, width, height):
+        self.title = title
+        self.width = width
+        self.height = height
+        # Код региона каждой клетки (ASCII), 0 - клетка не описана
+        self.region_grid = np.zeros((height, width), dtype=np.uint8)
+        self.regions = {}  # код -> Region
+        self.declared_regions = None
+        self.mines = {mine_type: [] for mine_type in MINE_TYPES.values()}  # тип -> [(x, y)]
+        # Номер металла рудника в клетке (1-4), 0 - рудника нет
+        self.mine_grid = np.zeros((height, width), dtype=np.uint8)
+        # Таблицы для векторных запросов по коду региона
+        self.income_table = np.zeros(256, dtype=np.int32)
+        self.sea_table = np.zeros(256, dtype=bool)
+        for code in SEA_CODES:
+            self.sea_table[ord(code)] = True
+        self.warnings = []
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            content = file.read()
+        return cls.parse(content.decode(detect_encoding(content), 'replace'))
+
+    @classmethod
+    def parse(cls, text):
+        lines = [line.rstrip('\r') for line in text.split('\n')]
+        title = lines[0].strip().strip('[]').strip()
+        width = int(lines[1].strip())
+        height = int(lines[2].strip())
+        model = cls(title, width, height)
+
+        position = 3
+        if position < len(lines) and lines[position].strip().lower() == '[land]':
+            position += 1
+            for y in range(height):
+                row = lines[position + y] if position + y < len(lines) else ''
+                if len(row) != width:
+                    model.warnings.append(f"Строка {y + 1} сетки регионов: {len(row)} символов вместо {width}")
+                codes = row[:width].encode('ascii', 'replace')
+                model.region_grid[y, :len(codes)] = np.frombuffer(codes, dtype=np.uint8)
+            position += height
+
+        # Строки рудников: номер металла и координаты
+        while position < len(lines):
+            parts = lines[position].replace(',', ' ').split()
+            if len(parts) < 3:
+                break
+            position += 1
+            try:
+                values = [int(part) for part in parts]
+            except ValueError:
+                model.warnings.append(f"Некорректная строка рудников: {lines[position - 1]}")
+                continue
+            metal = values[0]
+            mine_type = MINE_TYPES.get(metal)
+            if mine_type is None:
+                model.warnings.append(f"Неизвестный металл рудника: {metal}")
+                continue
+            for x, y in zip(values[1::2], values[2::2]):
+                model.mines[mine_type].append((x, y))
+                if 1 <= x <= width and 1 <= y <= height:
+                    model.mine_grid[y - 1, x - 1] = metal
+
+        # Таблица регионов
+        if position < len(lines) and lines[position].strip().isdigit():
+            model.declared_regions = int(lines[position].strip())
+            position += 1
+        while position < len(lines):
+            code = lines[position].strip()
+            if not code:
+                position += 1
+                continue
+            if position + 2 >= len(lines):
+                model.warnings.append(f"Неполная запись региона {code}")
+                break
+            name = lines[position + 1].strip()
+            try:
+                income = int(lines[position + 2].strip())
+            except ValueError:
+                model.warnings.append(f"Некорректный доход региона {code}: {lines[position + 2]}")
+                income = 0
+            model.add_region(code, name, income)
+            position += 3
+        return model
+
+    def add_region(self, code, name, income):
+        self.regions[code] = Region(code, name, income)
+        byte = ord(code) if len(code) == 1 and ord(code) < 256 else None
+        if byte is not None:
+            self.income_table[byte] = income
+
+    def region_code(self, x, y):
+        """Код региона клетки (игровые координаты с 1) или ''"""
+        if 1 <= x <= self.width and 1 <= y <= self.height:
+            code = self.region_grid[y - 1, x - 1]
+            return chr(code) if code else ''
+        return ''
+
+    def region(self, x, y):
+        return self.regions.get(self.region_code(x, y))
+
+    def income(self, x, y):
+        region = self.region(x, y)
+        return region.income if region else 0
+
+    def is_sea(self, x, y):
+        code = self.region_code(x, y)
+        return bool(code) and code in SEA_CODES
+
+    def mine_type(self, x, y):
+        if 1 <= x <= self.width and 1 <= y <= self.height:
+            return MINE_TYPES.get(int(self.mine_grid[y - 1, x - 1]))
+        return None
+
+    def codes_at(self, xs, ys):
+        """Коды регионов для массивов координат (игровые, с 1)"""
+        xs = np.clip(np.asarray(xs) - 1, 0, self.width - 1)
+        ys = np.clip(np.asarray(ys) - 1, 0, self.height - 1)
+        return self.region_grid[ys, xs]
+
+    def incomes_at(self, xs, ys):
+        return self.income_table[self.codes_at(xs, ys)]
+
+    def sea_at(self, xs, ys):
+        return self.sea_table[self.codes_at(xs, ys)]
@@ -0,0 +1,136 @@
+from collections import namedtuple
+
+import numpy as np
+import pygame
+
+# Классы пикселей рамки игрового поля
+OTHER, BLACK, WHITE = 0, 1, 2
+
+FieldBorders = namedtuple(
+    'FieldBorders',
+    'left top right bottom pitch_x pitch_y origin_x origin_y cells_x cells_y scan_marks'
+)
+
+
+def classify_pixels(pixels, black_max=30, white_min=225):
+    """Классифицирует пиксели (..., 3) на черные, белые и прочие"""
+    black = (pixels < black_max).all(axis=-1)
+    white = (pixels > white_min).all(axis=-1)
+    return (black.astype(np.int8) + white.astype(np.int8) * WHITE).astype(np.int8)
+
+
+def first_run(lines, min_run):
+    """Ищет первую серию из min_run одинаковых черных/белых пикселей.
+
+    lines - двумерный массив классов (линия сканирования, позиция в порядке
+    обхода). Возвращает (номер линии, позиция начала серии) или (None, None).
+    """
+    if lines.shape[1] < min_run:
+        return None, None
+    n = lines.shape[1] - min_run + 1
+    hits = lines[:, :n] != OTHER
+    for k in range(1, min_run):
+        hits &= lines[:, :n] == lines[:, k:k + n]
+    found = hits.any(axis=1)
+    if not found.any():
+        return None, None
+    line = int(np.argmax(found))
+    return line, int(np.argmax(hits[line]))
+
+
+def fit_pitch(stripe):
+    """Подгонка шага сетки по полосатой линейке рамки.
+
+    Начала черно-белых сегментов аппроксимируются прямой
+    start_k = offset + k * pitch методом наименьших квадратов, поэтому шаг
+    получается с субпиксельной точностью. Возвращает (pitch, offset, count).
+    """
+    previous = np.concatenate(([OTHER], stripe[:-1]))
+    starts = np.flatnonzero((stripe != OTHER) & (stripe != previous))
+    if len(starts) < 2:
+        return None, None, len(starts)
+    pitch, offset = np.polyfit(np.arange(len(starts)), starts, 1)
+    return round(float(pitch), 6), float(offset), len(starts)
+
+
+def detect_field_borders(pixels, scan_depth=50, scan_lines=5, min_run=3):
+    """Находит границы игрового поля и шаг клеток за один проход по буферу.
+
+    pixels - массив (ширина, высота, 3), как его отдает pygame.surfarray.
+    Границы ищутся так же, как при ручном обходе: от scan_depth пикселя к
+    краю изображения в нескольких линиях около середины стороны.
+    Возвращает FieldBorders или None, если рамка не найдена.
+    """
+    width, height = pixels.shape[0], pixels.shape[1]
+
+    start_y = height // 2 - scan_lines // 2
+    start_x = width // 2 - scan_lines // 2
+    # Классифицируем только полосы сканирования, а не весь буфер
+    row_band = classify_pixels(pixels[:, start_y:start_y + scan_lines])
+    col_band = classify_pixels(pixels[start_x:start_x + scan_lines, :])
+
+    # Позиции в порядке обхода для каждой стороны
+    left_xs = np.arange(min(scan_depth, width - 1), -1, -1)
+    right_xs = np.arange(max(width - scan_depth, 0), width)
+    top_ys = np.arange(min(scan_depth, height - 1), 0, -1)
+    bottom_ys = np.arange(max(height - scan_depth, 0), height)
+
+    left_line, left_pos = first_run(row_band[left_xs].T, min_run)
+    right_line, right_pos = first_run(row_band[right_xs].T, min_run)
+    top_line, top_pos = first_run(col_band[:, top_ys], min_run)
+    bottom_line, bottom_pos = first_run(col_band[:, bottom_ys], min_run)
+
+    if None in (left_pos, right_pos, top_pos, bottom_pos):
+        return None
+
+    # Слева и сверху граница - сразу за серией, справа и снизу - ее начало
+    left = int(left_xs[left_pos]) + 1
+    right = int(right_xs[right_pos])
+    top = int(top_ys[top_pos]) + 1
+    bottom = int(bottom_ys[bottom_pos])
+
+    # Полосатая линейка рамки проходит по середине найденной серии
+    stripe_offset = (min_run + 1) // 2
+    pitch_x, offset_x, cells_x = fit_pitch(
+        classify_pixels(pixels[left:right, top - stripe_offset]))
+    pitch_y, offset_y, cells_y = fit_pitch(
+        classify_pixels(pixels[left - stripe_offset, top:bottom]))
+
+    # Линия сетки - пиксель-разделитель перед началом сегмента
+    origin_x = round(left + offset_x - 1, 6) if pitch_x else float(left)
+    origin_y = round(top + offset_y - 1, 6) if pitch_y else float(top)
+
+    scan_marks = {
+        'left': (int(left_xs[left_pos]), start_y + left_line),
+        'right': (int(right_xs[right_pos]), start_y + right_line),
+        'top': (start_x + top_line, int(top_ys[top_pos])),
+        'bottom': (start_x + bottom_line, int(bottom_ys[bottom_pos])),
+    }
+    return FieldBorders(left, top, right, bottom, pitch_x, pitch_y,
+                        origin_x, origin_y, cells_x, cells_y, scan_marks)
+
+
+def draw_debug_marks(surface, borders, scan_depth=50, min_run=3):
+    """Отладочная визуализация поиска рамки на поверхности pygame"""
+    width, height = surface.get_width(), surface.get_height()
+    for side, (x, y) in borders.scan_marks.items():
+        # Красным - отрезок сканирования, зеленым - найденная серия
+        if side == 'left':
+            pygame.draw.line(surface, (255, 0, 0), (x, y), (min(scan_depth, width - 1), y))
+            pygame.draw.line(surface, (0, 255, 0), (x - min_run + 1, y), (x, y))
+        elif side == 'right':
+            pygame.draw.line(surface, (255, 0, 0), (width - scan_depth, y), (x, y))
+            pygame.draw.line(surface, (0, 255, 0), (x, y), (x + min_run - 1, y))
+        elif side == 'top':
+            pygame.draw.line(surface, (255, 0, 0), (x, y), (x, min(scan_depth, height - 1)))
+            pygame.draw.line(surface, (0, 255, 0), (x, y - min_run + 1), (x, y))
+        else:
+            pygame.draw.line(surface, (255, 0, 0), (x, height - scan_depth), (x, y))
+            pygame.draw.line(surface, (0, 255, 0), (x, y), (x, y + min_run - 1))
+
+    # Салатовые линии найденных границ
+    light_green = (144, 238, 144)
+    pygame.draw.line(surface, light_green, (borders.left, 0), (borders.left, height - 1))
+    pygame.draw.line(surface, light_green, (borders.right, 0), (borders.right, height - 1))
+    pygame.draw.line(surface, light_green, (0, borders.top), (width - 1, borders.top))
+    pygame.draw.line(surface, light_green, (0, borders.bottom), (width - 1, borders.bottom))
@@ -0,0 +1,262 @@
+"""Каталог игр: один проход по корню с множеством игровых директорий.
+
+Игрой считается директория с ANT.DAT - сам корень или его поддиректория.
+Для каждой игры индексируются заголовок и размеры карты из ANT.DAT, номера
+ходов (со всеми вариантами имен файлов ходов) и имена файлов без учета
+регистра. Индекс сохраняется в скрытой поддиректории корня (запись в сам
+корень меняла бы время его изменения, и игра в корне никогда не совпадала
+бы с индексом) и при следующем запуске переиспользуется для директорий,
+время изменения которых не поменялось.
+Уменьшенные копии карт для выбора игры кэшируются в директориях игр.
+"""
+import json
+import logging
+import os
+import re
+
+import pygame
+
+from .map_image import MapImage
+from .svs_parser import detect_encoding
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = '.vs25_cache'
+INDEX_FILE = os.path.join(THUMBNAIL_DIR, 'catalog.json')
+INDEX_VERSION = 1
+
+# Год12.svs, год12.svs и сокращенное ®¤12.svs
+TURN_NAME = re.compile(r'(?:[Гг]од|®¤)(\d+)\.svs', re.IGNORECASE)
+
+
+def turn_number(filename):
+    """Номер хода по имени файла или None.
+
+    Имена, записанные в DOS-кодировке, в файловой системе встречаются
+    перекодированными: 'Год' в cp866 байтами 83 AE A4, прочитанными как
+    latin-1, дает '\\x83®¤'; непреобразуемые байты Linux отдает как
+    суррогаты. Все такие варианты приводятся к 'Год'.
+    """
+    candidates = [filename]
+    for raw in (filename.encode('latin-1', 'ignore'), os.fsencode(filename)):
+        for encoding in ('cp866', 'cp1251'):
+            try:
+                candidates.append(raw.decode(encoding))
+            except UnicodeDecodeError:
+                pass
+    for candidate in candidates:
+        match = TURN_NAME.fullmatch(candidate)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def read_ant_header(path):
+    """(заголовок, ширина, высота) из первых строк ANT.DAT"""
+    with open(path, 'rb') as file:
+        head = file.read(256)
+    text = head.decode(detect_encoding(head), 'replace')
+    lines = text.split('\n')
+    return lines[0].strip().strip('[]').strip(), int(lines[1]), int(lines[2])
+
+
+class GameEntry:
+    """Одна игра каталога"""
+
+    def __init__(self, path, title='', width=0, height=0, turns=None, files=None,
+                 dir_mtime=0, ant_mtime=0):
+        self.path = path
+        self.title = title
+        self.width = width
+        self.height = height
+        self.turns = turns or {}  # номер хода -> имя файла
+        self.files = files or {}  # имя в нижнем регистре -> имя файла
+        self.dir_mtime = dir_mtime
+        self.ant_mtime = ant_mtime
+        self.replay = None  # файл повтора, из которого распакована игра
+
+    @property
+    def max_turn(self):
+        return max(self.turns, default=0)
+
+    def turn_path(self, turn):
+        name = self.turns.get(turn)
+        return os.path.join(self.path, name) if name else None
+
+    def file_path(self, filename):
+        """Путь к файлу игры без учета регистра имени или None"""
+        name = self.files.get(filename.lower())
+        return os.path.join(self.path, name) if name else None
+
+    def register_file(self, name):
+        """Учитывает появившийся, измененный или удаленный файл игры.
+
+        Возвращает номер хода, если это файл хода, иначе None.
+        """
+        exists = os.path.isfile(os.path.join(self.path, name))
+        key = name.lower()
+        if exists:
+            self.files.setdefault(key, name)
+        elif self.files.get(key) == name:
+            del self.files[key]
+        turn = turn_number(name)
+        if turn is not None:
+            if exists:
+                self.turns.setdefault(turn, name)
+            elif self.turns.get(turn) == name:
+                del self.turns[turn]
+        return turn
+
+    def to_json(self):
+        return {
+            'title': self.title, 'width': self.width, 'height': self.height,
+            'turns': {str(turn): name for turn, name in self.turns.items()},
+            'files': self.files, 'dir_mtime': self.dir_mtime, 'ant_mtime': self.ant_mtime,
+        }
+
+    @classmethod
+    def from_json(cls, path, data):
+        return cls(path, data['title'], data['width'], data['height'],
+                   {int(turn): name for turn, name in data['turns'].items()},
+                   data['files'], data['dir_mtime'], data['ant_mtime'])
+
+
+class GameCatalog:
+    def __init__(self, root='.'):
+        self.root = root
+        self.games = {}  # нормализованный путь -> GameEntry
+
+    @staticmethod
+    def key(path):
+        return os.path.normpath(os.path.abspath(path))
+
+    def index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def load_index(self):
+        try:
+            with open(self.index_path(), encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != INDEX_VERSION:
+            return {}
+        return data.get('games', {})
+
+    def save_index(self):
+        data = {'version': INDEX_VERSION,
+                'games': {os.path.relpath(entry.path, self.root): entry.to_json()
+                          for entry in self.games.values()}}
+        tmp_path = f'{self.index_path()}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.index_path()), exist_ok=True)
+            # Имена файлов могут содержать суррогаты - только ASCII-экранирование
+            with open(tmp_path, 'w', encoding='ascii') as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.index_path())
+        except OSError as e:
+            logger.warning("Индекс каталога не сохранен: %s", e)
+
+    def scan(self):
+        """Находит игры в корне и его поддиректориях; неизмененные берет из индекса"""
+        cached = self.load_index()
+        # Директория индекса создается до обхода: ее появление меняет время
+        # изменения корня, и записанное в индекс время должно быть уже новым
+        try:
+            os.makedirs(os.path.dirname(self.index_path()), exist_ok=True)
+        except OSError:
+            pass
+        directories = [self.root]
+        with os.scandir(self.root) as entries:
+            directories.extend(sorted(entry.path for entry in entries
+                                      if entry.is_dir() and not entry.name.startswith('.')))
+        games = {}
+        for directory in directories:
+            entry = self.index_directory(directory, cached.get(os.path.relpath(directory, self.root)))
+            if entry is not None:
+                games[self.key(directory)] = entry
+        self.games = games
+        self.save_index()
+        logger.debug("В каталоге %s найдено игр: %d", self.root, len(games))
+        return self
+
+    def index_directory(self, directory, cached=None):
+        """GameEntry директории (из индекса, если она не менялась) или None"""
+        try:
+            dir_mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        if cached is not None and cached['dir_mtime'] == dir_mtime:
+            entry = GameEntry.from_json(directory, cached)
+            ant_path = entry.file_path('ANT.DAT')
+            if ant_path and os.stat(ant_path).st_mtime_ns == entry.ant_mtime:
+                return entry
+
+        # Один листинг директории на игру
+        files = {}
+        turns = {}
+        with os.scandir(directory) as entries:
+            for item in sorted(entries, key=lambda item: item.name):
+                if not item.is_file():
+                    continue
+                files.setdefault(item.name.lower(), item.name)
+                turn = turn_number(item.name)
+                if turn is not None:
+                    turns.setdefault(turn, item.name)
+        if 'ant.dat' not in files:
+            return None
+
+        ant_path = os.path.join(directory, files['ant.dat'])
+        try:
+            title, width, height = read_ant_header(ant_path)
+        except (OSError, ValueError, IndexError) as e:
+            logger.warning("Пропуск игры %s: %s", directory, e)
+            return None
+        return GameEntry(directory, title, width, height, turns, files,
+                         dir_mtime, os.stat(ant_path).st_mtime_ns)
+
+    def add(self, directory):
+        """Добавляет игру вне корня (или переиндексирует ее)"""
+        entry = self.index_directory(directory)
+        if entry is None:
+            raise FileNotFoundError(f"В директории {directory} нет ANT.DAT")
+        self.games[self.key(directory)] = entry
+        return entry
+
+    def get(self, directory):
+        return self.games.get(self.key(directory))
+
+    def entries(self):
+        """Игры по порядку: корень, затем поддиректории по имени"""
+        return list(self.games.values())
+
+    def neighbour(self, directory, step):
+        """Следующая (step=1) или предыдущая (step=-1) игра по кругу; None, если игр нет"""
+        entries = self.entries()
+        if not entries:
+            return None
+        keys = [self.key(entry.path) for entry in entries]
+        index = keys.index(self.key(directory)) if self.key(directory) in keys else 0
+        return entries[(index + step) % len(entries)]
+
+    def thumbnail(self, entry, width=160):
+        """Уменьшенная копия MAP.BMP игры; кэшируется в PNG рядом с игрой"""
+        map_path = entry.file_path('MAP.BMP')
+        if map_path is None:
+            return None
+        thumb_path = os.path.join(entry.path, THUMBNAIL_DIR, f'thumb_{width}.png')
+        try:
+            if os.stat(thumb_path).st_mtime_ns >= os.stat(map_path).st_mtime_ns:
+                return pygame.image.load(thumb_path)
+        except (OSError, pygame.error):
+            pass
+
+        image = MapImage.open(map_path)
+        height = max(1, round(width * image.height / image.width))
+        thumb = pygame.transform.smoothscale(image.surface(), (width, height))
+        try:
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            pygame.image.save(thumb, thumb_path)
+        except (OSError, pygame.error) as e:
+            logger.debug("Миниатюра %s не сохранена: %s", thumb_path, e)
+        return thumb
@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+# Типы строений и войск, как их различает интерфейс
+BUILDING_TYPES = 'КГЗПБCSGM'
+ARMY_TYPES = 'гвэопрмзд'
+
+CellObject = namedtuple('CellObject', 'obj_type name owner state color')
+
+
+class CellIndex:
+    """Пространственный индекс хода: сетка map_width x map_height.
+
+    Каждая клетка хранит кортеж объектов с уже известными владельцем и
+    названием типа, поэтому запросы для подсказки выполняются за O(1)
+    вместо перебора всех объектов и всех игроков.
+    """
+
+    EMPTY = ()
+
+    def __init__(self, map_width, map_height, players, game_objects):
+        self.map_width = map_width
+        self.map_height = map_height
+        cells = [None] * (map_width * map_height)
+
+        for player in players:
+            owner = player.get('name')
+            for obj in player.get('objects', []):
+                obj_type, x, y, state, color = obj[:5]
+                # Игровые координаты начинаются с 1
+                cell_x, cell_y = x - 1, y - 1
+                if not (0 <= cell_x < map_width and 0 <= cell_y < map_height):
+                    continue
+                name = game_objects.get(obj_type, [obj_type])[0]
+                offset = cell_y * map_width + cell_x
+                if cells[offset] is None:
+                    cells[offset] = []
+                cells[offset].append(CellObject(obj_type, name, owner, state, color))
+
+        self.cells = [tuple(cell) if cell else self.EMPTY for cell in cells]
+        self.buildings_cells = [
+            tuple(o for o in cell if o.obj_type in BUILDING_TYPES) if cell else self.EMPTY
+            for cell in self.cells
+        ]
+        self.armies_cells = [
+            tuple(o for o in cell if o.obj_type in ARMY_TYPES) if cell else self.EMPTY
+            for cell in self.cells
+        ]
+
+    def offset(self, cell_x, cell_y):
+        if 0 <= cell_x < self.map_width and 0 <= cell_y < self.map_height:
+            return cell_y * self.map_width + cell_x
+        return None
+
+    def objects(self, cell_x, cell_y):
+        """Все объекты клетки (координаты клетки с нуля)"""
+        offset = self.offset(cell_x, cell_y)
+        return self.EMPTY if offset is None else self.cells[offset]
+
+    def buildings(self, cell_x, cell_y):
+        offset = self.offset(cell_x, cell_y)
+        return self.EMPTY if offset is None else self.buildings_cells[offset]
+
+    def armies(self, cell_x, cell_y):
+        offset = self.offset(cell_x, cell_y)
+        return self.EMPTY if offset is None else self.armies_cells[offset]
+
+    def owner(self, cell_x, cell_y, name):
+        """Владелец первого объекта клетки с указанным названием типа"""
+        for obj in self.objects(cell_x, cell_y):
+            if obj.name == name:
+                return obj.owner
+        return None
@@ -0,0 +1,51 @@
+"""Диагностика просмотрщика: уровни журнала и отчеты о разборе ходов.
+
+Модули пишут через logging.getLogger(__name__) с отложенным форматированием
+('%s'), поэтому выключенный уровень стоит одной проверки. По умолчанию
+выводятся только предупреждения и ошибки; подробный режим включает отладку.
+"""
+import logging
+import threading
+
+LOG_FORMAT = '%(levelname)s %(name)s: %(message)s'
+
+
+def setup_logging(verbose=False):
+    """Тихий режим по умолчанию (WARNING), подробный - DEBUG"""
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.WARNING,
+                        format=LOG_FORMAT, force=True)
+
+
+class ParseReports:
+    """Предупреждения разбора по ходам; заполняется в том числе из фоновых потоков"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reports = {}  # ход -> (файл, [(номер строки, сообщение)])
+
+    def record(self, turn, turn_file, warnings):
+        with self.lock:
+            self.reports[turn] = (turn_file, list(warnings))
+
+    def get(self, turn):
+        """(файл, предупреждения) хода или None, если ход еще не разбирался"""
+        with self.lock:
+            return self.reports.get(turn)
+
+    def turns_with_warnings(self):
+        with self.lock:
+            return sorted(turn for turn, (_, warnings) in self.reports.items() if warnings)
+
+    def format(self, turn):
+        """Текст отчета о ходе для журнала"""
+        report = self.get(turn)
+        if report is None:
+            return f"Ход {turn} не разбирался"
+        turn_file, warnings = report
+        if not warnings:
+            return f"Ход {turn} ({turn_file}): замечаний нет"
+        lines = [f"Ход {turn} ({turn_file}): замечаний {len(warnings)}"]
+        for line_number, message in warnings:
+            where = f"строка {line_number}" if line_number is not None else "файл"
+            lines.append(f"  {where}: {message}")
+        return '\n'.join(lines)
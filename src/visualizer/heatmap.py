@@ -0,0 +1,98 @@
+"""Тепловая карта присутствия войск за диапазон ходов.
+
+Число войск (строчные типы game_objects) в каждой клетке суммируется по
+ходам [first, last] для выбранных игроков: ходы лежат в TurnHistory
+подряд, поэтому весь диапазон - один np.bincount по срезу столбцов.
+Накопленная сумма запоминается на набор игроков; при сдвиге диапазона
+на ход добавляется или вычитается гистограмма только этого хода.
+Готовые поверхности (клетка на пиксель, цвет и прозрачность по плотности)
+кэшируются на набор игроков и диапазон.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+
+class ArmyHeatmap:
+    def __init__(self, history, width, height, army_types, cache_surfaces=16):
+        self.history = history
+        self.width = width
+        self.height = height
+        self.army_types = army_types
+        self.cache_surfaces = cache_surfaces
+        self.sums = {}  # набор игроков -> (first, last, суммы по клеткам)
+        self.surfaces = OrderedDict()  # (набор игроков, first, last) -> поверхность
+        self.generation = history.generation
+
+    def histogram(self, owners, first, last):
+        """Число войск по клеткам за ходы [first, last] одним bincount"""
+        cells = self.width * self.height
+        if first > last:
+            return np.zeros(cells, dtype=np.int64)
+        with self.history.lock:
+            start, end = self.history.offsets[first], self.history.offsets[last + 1]
+            columns = {name: self.history.objects[name][start:end]
+                       for name in ('types', 'xs', 'ys', 'owners')}
+            army_codes = [code for code, char in enumerate(self.history.type_chars)
+                          if char in self.army_types]
+
+        xs = columns['xs'].astype(np.int64) - 1
+        ys = columns['ys'].astype(np.int64) - 1
+        mask = np.isin(columns['types'], army_codes)
+        mask &= (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        if owners is not None:
+            mask &= np.isin(columns['owners'], list(owners))
+        return np.bincount(ys[mask] * self.width + xs[mask], minlength=cells)
+
+    def counts(self, owners, first, last):
+        """Суммы за [first, last]; от прошлого диапазона считается только разница"""
+        if self.generation != self.history.generation:
+            self.sums.clear()
+            self.surfaces.clear()
+            self.generation = self.history.generation
+
+        state = self.sums.get(owners)
+        if state is not None:
+            old_first, old_last, sums = state
+            changed = abs(first - old_first) + abs(last - old_last)
+            if changed > last - first + 1 or old_first > last or first > old_last:
+                state = None
+        if state is None:
+            sums = self.histogram(owners, first, last)
+        else:
+            sums = sums.copy()
+            # Начало диапазона
+            if first < old_first:
+                sums += self.histogram(owners, first, old_first - 1)
+            elif first > old_first:
+                sums -= self.histogram(owners, old_first, first - 1)
+            # Конец диапазона
+            if last > old_last:
+                sums += self.histogram(owners, old_last + 1, last)
+            elif last < old_last:
+                sums -= self.histogram(owners, last + 1, old_last)
+        self.sums[owners] = (first, last, sums)
+        return sums
+
+    def surface(self, owners, first, last, alpha=190):
+        """Поверхность width x height: от прозрачного через желтый к красному"""
+        key = (owners, first, last)
+        surface = self.surfaces.get(key)
+        if surface is not None and self.generation == self.history.generation:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        sums = self.counts(owners, first, last)
+        # Корень сглаживает разницу между редкими и частыми клетками
+        heat = np.sqrt(sums / max(int(sums.max()), 1))
+        pixels = np.zeros((self.width * self.height, 4), dtype=np.uint8)
+        pixels[:, 0] = 255
+        pixels[:, 1] = (255 * (1 - heat)).astype(np.uint8)
+        pixels[:, 3] = (alpha * heat).astype(np.uint8)
+        surface = pygame.image.fromstring(pixels.tobytes(), (self.width, self.height), 'RGBA')
+
+        self.surfaces[key] = surface
+        while len(self.surfaces) > self.cache_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
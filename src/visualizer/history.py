@@ -0,0 +1,293 @@
+"""История всех ходов игры в столбцах NumPy.
+
+Объекты всех ходов лежат подряд в общих столбцах: код типа, x, y, флаги
+состояния, номер владельца и строка того же войска в прошлом ходе (пути
+войск, см. tracks); ход N - это срез [offsets[N], offsets[N + 1]).
+Игроки ходов хранятся так же: номер в таблице игроков партии, цвет, доход,
+казна и конец его объектов в срезе хода. Номер хода строки не хранится - он
+следует из смещений (turn_column() восстанавливает его при необходимости).
+
+Столбцы растут удвоением емкости, поэтому история строится по одному ходу,
+в фоне, и годится для длинных партий: объект занимает 13 байт.
+"""
+import logging
+import threading
+
+import numpy as np
+
+from .tracks import NO_TRACK, match_armies
+
+logger = logging.getLogger(__name__)
+
+# (имя, тип) столбцов объектов и игроков ходов
+OBJECT_COLUMNS = (('types', np.uint8), ('xs', np.uint16), ('ys', np.uint16),
+                  ('states', np.uint16), ('owners', np.uint16), ('prev', np.int32))
+PLAYER_COLUMNS = (('ids', np.uint16), ('colors', np.uint32), ('incomes', np.int64),
+                  ('treasuries', np.int64), ('ends', np.uint32))
+
+
+class Columns:
+    """Набор одинаковой длины растущих столбцов"""
+
+    def __init__(self, spec, capacity=1024):
+        self.size = 0
+        self.data = {name: np.empty(capacity, dtype) for name, dtype in spec}
+
+    def __getitem__(self, name):
+        return self.data[name][:self.size]
+
+    def extend(self, count, **values):
+        needed = self.size + count
+        capacity = len(next(iter(self.data.values())))
+        if needed > capacity:
+            capacity = max(needed, capacity * 2)
+            for name, column in self.data.items():
+                grown = np.empty(capacity, column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.data[name] = grown
+        for name, column in self.data.items():
+            column[self.size:needed] = values[name]
+        self.size = needed
+
+    def truncate(self, size):
+        self.size = min(self.size, size)
+
+    @property
+    def nbytes(self):
+        return sum(column[:self.size].nbytes for column in self.data.values())
+
+
+def players_from_columns(columns, players, type_chars, player_table):
+    """(objects, players_info) как у parse_turn_content из списков столбцов хода.
+
+    columns - types, xs, ys, states; players - столбцы PLAYER_COLUMNS по порядку.
+    """
+    players_info = []
+    objects = []
+    begin = 0
+    for player_id, color, income, treasury, obj_end in zip(*players):
+        name, contact, country = player_table[player_id]
+        player_objects = [(type_chars[code], x, y, state, color)
+                          for code, x, y, state in zip(*(column[begin:obj_end]
+                                                         for column in columns))]
+        objects.extend(player_objects)
+        players_info.append({
+            'name': name,
+            'contact': contact,
+            'country': country,
+            'income': income,
+            'treasury': treasury,
+            'color': color,
+            'objects': player_objects,
+        })
+        begin = obj_end
+    return objects, players_info
+
+
+class TurnHistory:
+    def __init__(self, type_chars='', track_types=''):
+        self.lock = threading.Lock()
+        self.track_types = track_types  # типы, пути которых восстанавливаются
+        self.type_chars = list(type_chars)  # код типа -> буква
+        self.type_codes = {char: code for code, char in enumerate(self.type_chars)}
+        self.player_table = []  # номер -> (name, contact, country)
+        self.player_ids = {}  # (name, contact, country) -> номер
+        self.objects = Columns(OBJECT_COLUMNS)
+        self.players = Columns(PLAYER_COLUMNS, capacity=256)
+        self.offsets = [0]  # начала ходов в столбцах объектов и конец последнего
+        self.player_offsets = [0]
+        self.generation = 0  # растет, когда построенные ходы забываются
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def has(self, turn):
+        return 0 <= turn < len(self)
+
+    def type_code(self, char):
+        code = self.type_codes.get(char)
+        if code is None:
+            code = self.type_codes[char] = len(self.type_chars)
+            self.type_chars.append(char)
+        return code
+
+    def player_id(self, player):
+        key = (player.get('name', ''), player.get('contact', ''), player.get('country', ''))
+        player_id = self.player_ids.get(key)
+        if player_id is None:
+            player_id = self.player_ids[key] = len(self.player_table)
+            self.player_table.append(key)
+        return player_id
+
+    def append(self, turn, players_info, generation=None):
+        """Добавляет ход turn, если он следующий по счету; иначе возвращает False.
+
+        Войска сопоставляются с прошлым ходом вне блокировки, чтобы не
+        задерживать чтение истории; если за это время история изменилась,
+        ход не добавляется. generation - поколение истории до чтения хода:
+        если с тех пор был truncate(), прочитанное могло устареть.
+        """
+        types, xs, ys, states, owners = [], [], [], [], []
+        ids, colors, incomes, treasuries, ends = [], [], [], [], []
+        with self.lock:
+            if turn != len(self) or generation not in (None, self.generation):
+                return False
+            generation = self.generation
+            for player in players_info:
+                player_id = self.player_id(player)
+                for obj_type, x, y, state, _ in player.get('objects', []):
+                    types.append(self.type_code(obj_type))
+                    xs.append(x)
+                    ys.append(y)
+                    states.append(state)
+                    owners.append(player_id)
+                ids.append(player_id)
+                colors.append(player.get('color', 0))
+                incomes.append(player.get('income', 0))
+                treasuries.append(player.get('treasury', 0))
+                ends.append(len(types))
+            previous = self.turn_columns(turn - 1) if turn > 0 else None
+            previous_start = self.offsets[turn - 1] if turn > 0 else 0
+            track_codes = [code for code, char in enumerate(self.type_chars)
+                           if char in self.track_types]
+
+        prev = np.full(len(types), NO_TRACK, dtype=np.int64)
+        if previous is not None and track_codes:
+            columns = {'types': np.array(types, dtype=np.int64), 'xs': np.array(xs, dtype=np.int64),
+                       'ys': np.array(ys, dtype=np.int64), 'owners': np.array(owners, dtype=np.int64)}
+            matched = match_armies(previous, columns, track_codes)
+            found = matched != NO_TRACK
+            prev[found] = matched[found] + previous_start
+
+        with self.lock:
+            if turn != len(self) or generation != self.generation:
+                return False
+            self.objects.extend(len(types), types=types, xs=xs, ys=ys,
+                                states=states, owners=owners, prev=prev)
+            self.players.extend(len(ids), ids=ids, colors=colors, incomes=incomes,
+                                treasuries=treasuries, ends=ends)
+            self.offsets.append(self.objects.size)
+            self.player_offsets.append(self.players.size)
+        return True
+
+    def append_columns(self, turn, objects, players, generation=None):
+        """Добавляет готовые столбцы хода (из файла повтора); prev - номер строки в прошлом ходе"""
+        with self.lock:
+            if turn != len(self) or generation not in (None, self.generation):
+                return False
+            prev = np.asarray(objects['prev'], dtype=np.int64)
+            if turn > 0:
+                prev = np.where(prev == NO_TRACK, NO_TRACK, prev + self.offsets[turn - 1])
+            self.objects.extend(len(prev), **dict(objects, prev=prev))
+            self.players.extend(len(players['ids']), **players)
+            self.offsets.append(self.objects.size)
+            self.player_offsets.append(self.players.size)
+        return True
+
+    def truncate(self, turn):
+        """Забывает ход turn и все последующие (например, если файл хода изменился)"""
+        with self.lock:
+            # Поколение меняется и для еще не добавленного хода: его может
+            # читать построитель, и прочитанное до изменения файла не попадет в историю
+            self.generation += 1
+            if turn >= len(self):
+                return
+            turn = max(turn, 0)
+            del self.offsets[turn + 1:]
+            del self.player_offsets[turn + 1:]
+            self.objects.truncate(self.offsets[-1])
+            self.players.truncate(self.player_offsets[-1])
+
+    def turn_columns(self, turn):
+        """Копии столбцов объектов хода (вызывать под блокировкой)"""
+        start, end = self.offsets[turn], self.offsets[turn + 1]
+        return {name: self.objects[name][start:end].copy() for name, _ in OBJECT_COLUMNS}
+
+    def turn_players(self, turn):
+        """Игроки хода в формате parse_turn_content: словари со списками объектов"""
+        with self.lock:
+            start, end = self.offsets[turn], self.offsets[turn + 1]
+            columns = [self.objects[name][start:end].tolist()
+                       for name in ('types', 'xs', 'ys', 'states')]
+            first, last = self.player_offsets[turn], self.player_offsets[turn + 1]
+            players = [self.players[name][first:last].tolist() for name, _ in PLAYER_COLUMNS]
+            type_chars = self.type_chars
+            player_table = self.player_table
+        return players_from_columns(columns, players, type_chars, player_table)
+
+    def turn_column(self):
+        """Номер хода каждой строки объектов"""
+        with self.lock:
+            return np.repeat(np.arange(len(self), dtype=np.uint16), np.diff(self.offsets))
+
+    @property
+    def nbytes(self):
+        with self.lock:
+            return self.objects.nbytes + self.players.nbytes + 8 * (len(self.offsets) * 2)
+
+
+class HistoryBuilder:
+    """Фоновое пополнение истории ходами 0..max_turn по порядку.
+
+    load_turn(turn) -> players_info или None, если хода нет. Повторный
+    start() только поднимает предел; после truncate() построение
+    продолжается с первого забытого хода. notify() вызывается из фонового
+    потока после каждого добавленного хода.
+    """
+
+    def __init__(self, history, load_turn, notify=None):
+        self.history = history
+        self.load_turn = load_turn
+        self.notify = notify
+        self.lock = threading.Lock()
+        self.target = -1
+        self.thread = None
+        self.stopped = False
+
+    def start(self, max_turn):
+        with self.lock:
+            self.target = max(self.target, max_turn)
+            if self.stopped or (self.thread is not None and self.thread.is_alive()):
+                return
+            self.thread = threading.Thread(target=self.run, name='turn-history', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            with self.lock:
+                # Поколение - до чтения хода, иначе изменение файла во время чтения потеряется
+                generation = self.history.generation
+                turn = len(self.history)
+                if self.stopped or turn > self.target:
+                    self.thread = None
+                    return
+            if self.add_turn(turn, generation) and self.notify is not None:
+                self.notify()
+
+    def add_turn(self, turn, generation):
+        """Читает и добавляет один ход; возвращает True, если он попал в историю"""
+        try:
+            players_info = self.load_turn(turn)
+        except Exception as e:
+            logger.error("Ход %d не попал в историю: %s", turn, e)
+            players_info = None
+        return self.history.append(turn, players_info or [], generation)
+
+    def stop(self):
+        """Останавливает построение, дожидаясь текущего хода"""
+        with self.lock:
+            self.stopped = True
+            thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def wait(self):
+        """Дожидается построения истории до предела"""
+        with self.lock:
+            thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    @property
+    def done(self):
+        return len(self.history) > self.target
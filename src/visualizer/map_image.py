@@ -0,0 +1,95 @@
+"""Пиксели MAP.BMP в одном общем буфере без копирования.
+
+Несжатый 24-битный BMP отображается в память (mmap) и отдается как
+NumPy-представление (ширина, высота, 3) в порядке RGB, как у
+pygame.surfarray, только для чтения. Строки BMP идут снизу вверх в порядке
+BGR - это учитывается шагами представления, данные не копируются.
+Поверхности pygame строятся из буфера лениво, по запросу.
+
+Открытые карты разделяются: повторное открытие того же неизмененного
+файла (например, из нескольких просмотрщиков) возвращает тот же объект.
+"""
+import mmap
+import os
+import struct
+import threading
+import weakref
+
+import numpy as np
+import pygame
+
+# BITMAPFILEHEADER и начало BITMAPINFOHEADER
+FILE_HEADER = struct.Struct('<2sIHHI')
+INFO_HEADER = struct.Struct('<IiiHHI')
+BI_RGB = 0
+
+_open_images = weakref.WeakValueDictionary()
+_open_lock = threading.Lock()
+
+
+class MapImage:
+    def __init__(self, path, pixels, mapping=None):
+        self.path = path
+        self.pixels = pixels  # (ширина, высота, 3), RGB, только чтение
+        self.mapping = mapping  # mmap, на который смотрит pixels
+        self.width, self.height = pixels.shape[0], pixels.shape[1]
+
+    @classmethod
+    def open(cls, path):
+        """Общий для всех MapImage файла path, пока файл не изменился"""
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with _open_lock:
+            image = _open_images.get(key)
+            if image is None:
+                image = cls.load(path)
+                _open_images[key] = image
+            return image
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        pixels = cls.map_bmp_pixels(mapping)
+        if pixels is not None:
+            return cls(path, pixels, mapping)
+
+        # Палитра, сжатие или другой формат - декодирует pygame (одна копия)
+        mapping.close()
+        pixels = pygame.surfarray.array3d(pygame.image.load(path))
+        pixels.flags.writeable = False
+        return cls(path, pixels)
+
+    @staticmethod
+    def map_bmp_pixels(mapping):
+        """Представление пикселей несжатого 24-битного BMP или None"""
+        if len(mapping) < FILE_HEADER.size + INFO_HEADER.size:
+            return None
+        magic, _, _, _, data_offset = FILE_HEADER.unpack_from(mapping, 0)
+        header_size, width, height, _, bits, compression = \
+            INFO_HEADER.unpack_from(mapping, FILE_HEADER.size)
+        if magic != b'BM' or header_size < 40 or bits != 24 or compression != BI_RGB:
+            return None
+        if width <= 0 or height == 0:
+            return None
+
+        rows = abs(height)
+        row_stride = (width * 3 + 3) & ~3
+        if data_offset + row_stride * rows > len(mapping):
+            return None
+        data = np.ndarray((rows, row_stride), dtype=np.uint8, buffer=mapping, offset=data_offset)
+        data = data[:, :width * 3].reshape(rows, width, 3)
+        if height > 0:
+            data = data[::-1]  # строки снизу вверх
+        # (y, x, BGR) -> (x, y, RGB)
+        return data[:, :, ::-1].transpose(1, 0, 2)
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def surface(self):
+        """Новая поверхность pygame с пикселями карты (единственная копия)"""
+        surface = pygame.Surface(self.size, depth=24)
+        pygame.surfarray.blit_array(surface, self.pixels)
+        return surface
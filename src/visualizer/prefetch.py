@@ -0,0 +1,105 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class TurnPrefetcher:
+    """Фоновая подгрузка соседних ходов.
+
+    После показа хода N пул потоков загружает и индексирует ходы N±radius,
+    начиная с ближайших. Готовых ходов хранится не больше max_turns; при
+    переполнении вытесняются самые далекие от текущего. При переходе далеко
+    от прошлого окна еще не начатые задания отменяются. notify() вызывается
+    из потока пула, когда готов очередной ход.
+    """
+
+    def __init__(self, prepare_turn, radius=2, max_turns=9, workers=2, notify=None):
+        # prepare_turn(turn) -> подготовленные данные хода или None
+        self.prepare_turn = prepare_turn
+        self.notify = notify
+        self.radius = radius
+        self.max_turns = max(max_turns, 1)
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='turn-prefetch')
+        self.lock = threading.Lock()
+        self.ready = OrderedDict()  # ход -> подготовленные данные
+        self.pending = {}  # ход -> Future
+        self.center = 0
+        self.generation = 0  # меняется при сбросе, чтобы отбросить устаревшие результаты
+
+    def window(self, center, max_turn):
+        """Соседние ходы в порядке удаления от текущего"""
+        turns = []
+        for distance in range(1, self.radius + 1):
+            for turn in (center + distance, center - distance):
+                if 0 <= turn <= max_turn:
+                    turns.append(turn)
+        return turns
+
+    def schedule(self, center, max_turn):
+        """Планирует подгрузку окна вокруг показанного хода"""
+        window = self.window(center, max_turn)
+        with self.lock:
+            self.center = center
+            # Отменяем задания вне нового окна (уже начатые доработают)
+            for turn, future in list(self.pending.items()):
+                if turn not in window and future.cancel():
+                    del self.pending[turn]
+            self.evict()
+            for turn in window:
+                if turn in self.ready or turn in self.pending:
+                    continue
+                self.pending[turn] = self.executor.submit(self.run_job, turn, self.generation)
+
+    def run_job(self, turn, generation):
+        try:
+            data = self.prepare_turn(turn)
+        except Exception as e:
+            logger.error("Ошибка фоновой загрузки хода %d: %s", turn, e)
+            data = None
+        with self.lock:
+            if self.generation != generation:
+                return
+            self.pending.pop(turn, None)
+            if data is None or abs(turn - self.center) > self.radius:
+                return
+            self.ready[turn] = data
+            self.evict()
+        if self.notify is not None:
+            self.notify()
+
+    def evict(self):
+        """Держит число готовых ходов в пределах бюджета (под блокировкой)"""
+        while len(self.ready) > self.max_turns:
+            farthest = max(self.ready, key=lambda turn: abs(turn - self.center))
+            del self.ready[farthest]
+
+    def take(self, turn):
+        """Готовые данные хода или None"""
+        with self.lock:
+            return self.ready.get(turn)
+
+    def put(self, turn, data):
+        """Запоминает ход, загруженный синхронно"""
+        with self.lock:
+            self.ready[turn] = data
+            self.evict()
+
+    def invalidate(self, turn=None):
+        """Сбрасывает подготовленные данные хода или всех ходов"""
+        with self.lock:
+            if turn is None:
+                self.ready.clear()
+            else:
+                self.ready.pop(turn, None)
+            # Результаты уже начатых заданий могут быть устаревшими
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+            self.generation += 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,52 @@
+"""Контроль регионов карты по строениям хода.
+
+Регион (код клетки в сетке [Land] из ANT.DAT) принадлежит игроку, у
+которого в нем наибольший вес строений: крепость и замок - 3, город - 2,
+поместье - 1. При равенстве весов регион спорный и не закрашивается,
+морские клетки не закрашиваются никогда. Веса по регионам и игрокам
+считаются одним np.bincount, владелец каждой клетки - выборкой из
+таблицы владельцев по сетке регионов.
+"""
+import numpy as np
+import pygame
+
+from .sprite_atlas import bgr_to_rgb
+
+CONTROL_WEIGHTS = {'К': 3, 'З': 3, 'Г': 2, 'П': 1}
+NO_OWNER = -1
+
+
+def region_owners(map_model, players):
+    """Номер владельца (индекс в players) для каждого из 256 кодов регионов или NO_OWNER"""
+    owners = np.full(256, NO_OWNER, dtype=np.int32)
+    buildings = [(obj[1], obj[2], CONTROL_WEIGHTS[obj[0]], index)
+                 for index, player in enumerate(players)
+                 for obj in player.get('objects', [])
+                 if obj[0] in CONTROL_WEIGHTS]
+    if not buildings:
+        return owners
+    xs, ys, weights, indices = np.array(buildings, dtype=np.int64).T
+    codes = map_model.codes_at(xs, ys).astype(np.int64)
+
+    weight = np.bincount(codes * len(players) + indices, weights=weights,
+                         minlength=256 * len(players)).reshape(256, len(players))
+    best = weight.argmax(axis=1)
+    top = weight.max(axis=1)
+    # Спорные (равный наибольший вес у нескольких игроков) и пустые регионы
+    leaders = (weight == top[:, None]).sum(axis=1)
+    held = (top > 0) & (leaders == 1) & ~map_model.sea_table
+    held[0] = False  # клетки без кода региона
+    owners[held] = best[held]
+    return owners
+
+
+def control_surface(map_model, players, alpha=110):
+    """Поверхность размером с карту в клетках: клетка залита цветом владельца региона"""
+    owners = region_owners(map_model, players)
+    palette = np.zeros((len(players) + 1, 4), dtype=np.uint8)  # последний - нет владельца
+    for index, player in enumerate(players):
+        palette[index, :3] = bgr_to_rgb(player.get('color', 0))
+        palette[index, 3] = alpha
+    cells = owners[map_model.region_grid]  # (высота, ширина)
+    pixels = palette[cells]  # NO_OWNER попадает в последнюю, прозрачную строку
+    return pygame.image.fromstring(pixels.tobytes(), (map_model.width, map_model.height), 'RGBA')
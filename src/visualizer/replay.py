@@ -0,0 +1,251 @@
+"""Файл повтора: вся игра в одном двоичном файле.
+
+В файле - файлы карты (ANT.DAT, MAP.BMP, пиктограммы), таблица игроков и
+типов и все ходы в столбцах TurnHistory. Каждый KEYFRAME_INTERVAL-й ход
+записан целиком (опорный), остальные - разностью столбцов с предыдущим
+ходом: порядок объектов в сейвах от хода к ходу почти не меняется, и
+разность в основном нулевая. Каждая запись сжата zlib.
+
+    заголовок   HEADER: магия, версия, интервал опорных ходов, число ходов,
+                смещения индекса и метаданных
+    записи      ходы, затем сжатые файлы игры
+    метаданные  сжатый JSON: заголовок, типы, игроки, где лежат файлы
+    индекс      INDEX_ENTRY на ход: смещение, длина, число объектов и игроков
+
+Загрузчик отображает файл в память; ход N восстанавливается из ближайшего
+опорного хода и не более KEYFRAME_INTERVAL - 1 разностей, независимо от
+длины партии. Просмотрщик декодирует показанный ход по запросу, а историю
+для ползунка, статистики и путей пополняет в фоне ReplayHistoryBuilder.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from .history import OBJECT_COLUMNS, PLAYER_COLUMNS, HistoryBuilder, players_from_columns
+from .tracks import NO_TRACK
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'VS25RPL\0'
+VERSION = 1
+KEYFRAME_INTERVAL = 16
+# магия, версия, интервал опорных ходов, число ходов, смещение индекса,
+# смещение и длина метаданных
+HEADER = struct.Struct('<8sHHIQQQ')
+INDEX_ENTRY = np.dtype([('offset', '<u8'), ('length', '<u4'),
+                        ('objects', '<u4'), ('players', '<u4')])
+# Файлы игры, без которых просмотрщик не откроет повтор
+GAME_FILES = ('ANT.DAT', 'MAP.BMP', 'OSNOVA.BMP', 'RUDNICI.BMP')
+# В файле ссылка на предшественника хранится номером строки в прошлом ходе
+STORED_OBJECT_COLUMNS = tuple((name, np.int32 if name == 'prev' else dtype)
+                              for name, dtype in OBJECT_COLUMNS)
+
+
+def replay_directory(path):
+    """Куда распаковываются файлы игры повтора: скрытый кэш рядом с ним"""
+    path = os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), '.vs25_cache',
+                        'replay_' + os.path.splitext(os.path.basename(path))[0])
+
+
+def encode_columns(columns, spec, previous=None):
+    """Байты столбцов; с previous - разности с ним (по модулю типа столбца)"""
+    parts = []
+    for name, dtype in spec:
+        values = np.asarray(columns[name], dtype=dtype)
+        if previous is not None:
+            base = np.zeros(len(values), dtype=dtype)
+            count = min(len(values), len(previous[name]))
+            base[:count] = previous[name][:count]
+            values = values - base
+        parts.append(values.astype(np.dtype(dtype).newbyteorder('<')).tobytes())
+    return b''.join(parts)
+
+
+def decode_columns(data, count, spec, previous=None):
+    columns = {}
+    position = 0
+    for name, dtype in spec:
+        dtype = np.dtype(dtype).newbyteorder('<')
+        values = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+        position += count * dtype.itemsize
+        values = values.astype(dtype.newbyteorder('='))
+        if previous is not None:
+            base = np.zeros(count, dtype=values.dtype)
+            common = min(count, len(previous[name]))
+            base[:common] = previous[name][:common]
+            values += base
+        columns[name] = values
+    return columns
+
+
+def history_turn(history, turn):
+    """Столбцы объектов и игроков хода из истории; ссылки prev - внутри прошлого хода"""
+    with history.lock:
+        start, end = history.offsets[turn], history.offsets[turn + 1]
+        objects = {name: history.objects[name][start:end].copy() for name, _ in OBJECT_COLUMNS}
+        first, last = history.player_offsets[turn], history.player_offsets[turn + 1]
+        players = {name: history.players[name][first:last].copy() for name, _ in PLAYER_COLUMNS}
+        previous_start = history.offsets[turn - 1] if turn > 0 else 0
+    prev = objects['prev'].astype(np.int64)
+    objects['prev'] = np.where(prev == NO_TRACK, NO_TRACK, prev - previous_start)
+    return objects, players
+
+
+def write_replay(path, history, title, game_files, keyframe_interval=KEYFRAME_INTERVAL):
+    """Записывает построенную историю и файлы игры (имя -> путь) в файл повтора"""
+    turns = len(history)
+    index = np.zeros(turns, dtype=INDEX_ENTRY)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(b'\0' * HEADER.size)
+        previous = None
+        for turn in range(turns):
+            objects, players = history_turn(history, turn)
+            key = turn % keyframe_interval == 0
+            payload = (encode_columns(objects, STORED_OBJECT_COLUMNS, None if key else previous)
+                       + encode_columns(players, PLAYER_COLUMNS))
+            record = zlib.compress(payload, 6)
+            index[turn] = (file.tell(), len(record), len(objects['types']), len(players['ids']))
+            file.write(record)
+            previous = objects
+
+        files = {}
+        for name, file_path in game_files.items():
+            with open(file_path, 'rb') as source:
+                record = zlib.compress(source.read(), 6)
+            files[name] = (file.tell(), len(record))
+            file.write(record)
+
+        with history.lock:
+            meta = {'title': title, 'type_chars': ''.join(history.type_chars),
+                    'player_table': history.player_table,
+                    'track_types': history.track_types, 'files': files}
+        meta_record = zlib.compress(json.dumps(meta, ensure_ascii=True).encode('ascii'), 6)
+        meta_offset = file.tell()
+        file.write(meta_record)
+        index_offset = file.tell()
+        file.write(index.tobytes())
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, keyframe_interval, turns,
+                               index_offset, meta_offset, len(meta_record)))
+    os.replace(tmp_path, path)
+    logger.info("Повтор %s: ходов %d, %d КБ", path, turns, os.path.getsize(path) // 1024)
+    return path
+
+
+class Replay:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mapping) < HEADER.size:
+            raise ValueError(f"{path}: не файл повтора")
+        magic, version, self.keyframe_interval, self.turns, index_offset, meta_offset, meta_length = \
+            HEADER.unpack_from(self.mapping, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: не файл повтора или другая версия ({version})")
+        self.index = np.frombuffer(self.mapping, dtype=INDEX_ENTRY, count=self.turns,
+                                   offset=index_offset)
+        self.meta = json.loads(zlib.decompress(self.mapping[meta_offset:meta_offset + meta_length]))
+        self.title = self.meta['title']
+        self.type_chars = self.meta['type_chars']
+        self.player_table = [tuple(player) for player in self.meta['player_table']]
+        self.decoded = None  # (ход, столбцы объектов) - для последовательного просмотра
+
+    def __len__(self):
+        return self.turns
+
+    def read_file(self, name):
+        offset, length = self.meta['files'][name]
+        return zlib.decompress(self.mapping[offset:offset + length])
+
+    def extract_files(self, directory):
+        """Распаковывает файлы игры (если их там еще нет) и возвращает directory"""
+        os.makedirs(directory, exist_ok=True)
+        replay_mtime = os.stat(self.path).st_mtime_ns
+        for name in self.meta['files']:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path) or os.stat(path).st_mtime_ns < replay_mtime:
+                with open(path, 'wb') as file:
+                    file.write(self.read_file(name))
+        return directory
+
+    def read_record(self, turn):
+        entry = self.index[turn]
+        offset = int(entry['offset'])
+        data = zlib.decompress(self.mapping[offset:offset + int(entry['length'])])
+        return data, int(entry['objects']), int(entry['players'])
+
+    def turn(self, turn):
+        """(столбцы объектов, столбцы игроков) хода; prev - номер строки в прошлом ходе"""
+        if not 0 <= turn < self.turns:
+            raise IndexError(turn)
+        key = turn - turn % self.keyframe_interval
+        # Соседний следующий ход декодируется одной разностью; ход читают и
+        # фоновый построитель истории, и главный поток - берем кортеж один раз
+        decoded = self.decoded
+        if decoded is not None and key <= decoded[0] < turn:
+            start, objects = decoded[0] + 1, decoded[1]
+        else:
+            start, objects = key, None
+        for number in range(start, turn + 1):
+            data, count, player_count = self.read_record(number)
+            objects = decode_columns(data, count, STORED_OBJECT_COLUMNS,
+                                     None if number == key else objects)
+        size = sum(np.dtype(dtype).itemsize for _, dtype in STORED_OBJECT_COLUMNS) * count
+        players = decode_columns(data[size:], player_count, PLAYER_COLUMNS)
+        self.decoded = (turn, objects)
+        return objects, players
+
+    def turn_players(self, turn):
+        """Ход в формате parse_turn_content: (objects, players_info)"""
+        objects, players = self.turn(turn)
+        return players_from_columns([objects[name].tolist() for name in ('types', 'xs', 'ys', 'states')],
+                                    [players[name].tolist() for name, _ in PLAYER_COLUMNS],
+                                    self.type_chars, self.player_table)
+
+    def prepare_history(self, history):
+        """Таблицы типов и игроков повтора в пустой истории: коды в столбцах - из них"""
+        with history.lock:
+            history.type_chars[:] = list(self.type_chars)
+            history.type_codes = {char: code for code, char in enumerate(history.type_chars)}
+            history.player_table[:] = self.player_table
+            history.player_ids = {player: number for number, player in enumerate(self.player_table)}
+        return history
+
+    def fill_history(self, history):
+        """Загружает все ходы в пустую историю без повторного сопоставления войск"""
+        self.prepare_history(history)
+        for number in range(self.turns):
+            objects, players = self.turn(number)
+            history.append_columns(number, objects, players)
+        return history
+
+    def close(self):
+        self.index = None
+        self.mapping.close()
+
+
+class ReplayHistoryBuilder(HistoryBuilder):
+    """Фоновое пополнение истории из файла повтора: столбцы готовы, войска уже сопоставлены"""
+
+    def __init__(self, history, replay, notify=None):
+        super().__init__(history, None, notify)
+        self.replay = replay
+        replay.prepare_history(history)
+
+    def add_turn(self, turn, generation):
+        if turn >= len(self.replay):
+            return self.history.append(turn, [], generation)
+        try:
+            objects, players = self.replay.turn(turn)
+        except (zlib.error, ValueError) as e:
+            logger.error("Ход %d повтора не прочитан: %s", turn, e)
+            return self.history.append(turn, [], generation)
+        return self.history.append_columns(turn, objects, players, generation)
@@ -0,0 +1,68 @@
+import pygame
+
+# Строения рисуются на квадрате во всю клетку, войска - на круге
+BUILDING_ICON_TYPES = ('К', 'Г', 'З', 'П', 'Б', 'C', 'S', 'G', 'M')
+MINE_ICON_TYPES = ('C', 'S', 'G', 'M')
+
+
+def bgr_to_rgb(color):
+    """Цвет игрока хранится в сейве как BGR в десятичной форме"""
+    return (color & 255, (color >> 8) & 255, (color >> 16) & 255)
+
+
+class SpriteAtlas:
+    """Атлас заранее скомпонованных спрайтов объектов.
+
+    Спрайт - подложка цвета владельца (круг с обводкой для войск, квадрат
+    для строений) вместе с масштабированной пиктограммой. Ключ - тип
+    объекта, цвет владельца и размер; состояние на спрайт не влияет.
+    Хранятся спрайты только нынешних размеров (use_sizes): рабочий набор
+    хода - типы на цвета игроков, и он помещается в атлас целиком.
+    """
+
+    def __init__(self, army_icons, mine_icons, icon_indices):
+        self.army_icons = army_icons
+        self.mine_icons = mine_icons
+        self.icon_indices = icon_indices
+        self.sizes = frozenset()
+        self.sprites = {}
+
+    def use_sizes(self, sizes):
+        """Размеры, которыми сейчас рисуются объекты; спрайты прочих размеров удаляются"""
+        sizes = frozenset(sizes)
+        if sizes != self.sizes:
+            self.sizes = sizes
+            self.sprites = {key: sprite for key, sprite in self.sprites.items() if key[2] in sizes}
+
+    def get(self, obj_type, color, icon_size):
+        key = (obj_type, color, icon_size)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.compose(obj_type, color, icon_size)
+            self.sprites[key] = sprite
+        return sprite
+
+    def compose(self, obj_type, color, icon_size):
+        """Рисует спрайт так же, как объект рисовался прямо на экране"""
+        half = icon_size // 2
+        # Круг радиуса half занимает 2 * half + 1 пикселей
+        sprite = pygame.Surface((icon_size + 1, icon_size + 1), pygame.SRCALPHA)
+        player_color = bgr_to_rgb(color)
+
+        if obj_type.islower():
+            pygame.draw.circle(sprite, player_color, (half, half), half)
+            # Цвет обводки зависит от яркости цвета игрока
+            brightness = sum(player_color) / 3
+            outline_color = (0, 0, 0) if brightness > 127 else (255, 255, 255)
+            pygame.draw.circle(sprite, outline_color, (half, half), half, 1)
+        else:
+            pygame.draw.rect(sprite, player_color, pygame.Rect(0, 0, icon_size, icon_size))
+
+        if obj_type in self.icon_indices:
+            icons = self.mine_icons if obj_type in MINE_ICON_TYPES else self.army_icons
+            icon = icons[self.icon_indices[obj_type]]
+            sprite.blit(pygame.transform.scale(icon, (icon_size, icon_size)), (0, 0))
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
@@ -0,0 +1,99 @@
+"""Статистика игроков по ходам, посчитанная сразу по всей истории.
+
+Все величины - массивы (ход, игрок партии[, тип объекта]), полученные
+одним np.bincount по столбцам TurnHistory, без циклов по объектам:
+численность по типам (в том числе рудники по металлам), замки и города,
+доход и казна. Игроки - таблица игроков истории; отсутствие игрока в ходе
+отмечает маска present.
+"""
+import csv
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Крепость считается замком, как и в контроле регионов (regions.CONTROL_WEIGHTS)
+CASTLE_TYPES = 'ЗК'
+CITY_TYPES = 'Г'
+MINE_METALS = 'CSGM'  # медь, серебро, золото, мифрил
+
+
+class PlayerStats:
+    def __init__(self, history):
+        with history.lock:
+            turns = len(history)
+            offsets = np.asarray(history.offsets, dtype=np.int64)
+            player_offsets = np.asarray(history.player_offsets, dtype=np.int64)
+            object_types = history.objects['types'].copy()
+            object_owners = history.objects['owners'].copy()
+            player_ids = history.players['ids'].copy()
+            colors = history.players['colors'].copy()
+            incomes = history.players['incomes'].copy()
+            treasuries = history.players['treasuries'].copy()
+            self.type_chars = list(history.type_chars)
+            self.player_table = list(history.player_table)
+
+        self.turns = turns
+        players = len(self.player_table)
+        types = len(self.type_chars)
+
+        # Номер хода каждой строки объектов и игроков
+        object_turns = np.repeat(np.arange(turns), np.diff(offsets))
+        player_turns = np.repeat(np.arange(turns), np.diff(player_offsets))
+
+        cells = (object_turns * players + object_owners) * types + object_types
+        self.counts = np.bincount(cells, minlength=turns * players * types) \
+            .reshape(turns, players, types).astype(np.int32)
+
+        rows = player_turns * players + player_ids
+        self.present = np.zeros(turns * players, dtype=bool)
+        self.present[rows] = True
+        self.present = self.present.reshape(turns, players)
+        self.income = np.zeros(turns * players, dtype=np.int64)
+        self.income[rows] = incomes
+        self.income = self.income.reshape(turns, players)
+        self.treasury = np.zeros(turns * players, dtype=np.int64)
+        self.treasury[rows] = treasuries
+        self.treasury = self.treasury.reshape(turns, players)
+        # Цвет игрока в последнем ходе, где он есть
+        self.colors = np.zeros(players, dtype=np.int64)
+        self.colors[player_ids] = colors
+        self.turn_colors = np.zeros(turns * players, dtype=np.int64)
+        self.turn_colors[rows] = colors
+        self.turn_colors = self.turn_colors.reshape(turns, players)
+
+    def type_columns(self, chars):
+        return [code for code, char in enumerate(self.type_chars) if char in chars]
+
+    def total(self, chars):
+        """Сумма численности по типам chars, массив (ход, игрок)"""
+        return self.counts[:, :, self.type_columns(chars)].sum(axis=2)
+
+    @property
+    def castles(self):
+        return self.total(CASTLE_TYPES)
+
+    @property
+    def cities(self):
+        return self.total(CITY_TYPES)
+
+    def player_color(self, player):
+        return int(self.colors[player])
+
+    def write_csv(self, path, type_names=None):
+        """Строка на игрока и ход; названия столбцов типов (и рудников) - из type_names"""
+        type_names = type_names or {}
+        castles, cities = self.castles, self.cities
+        with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(['ход', 'игрок', 'страна', 'цвет', 'доход', 'казна', 'замки и крепости', 'города']
+                            + [type_names.get(char, char) for char in self.type_chars])
+            for turn, player in zip(*np.nonzero(self.present)):
+                name, _, country = self.player_table[player]
+                writer.writerow([turn, name, country, self.turn_colors[turn, player],
+                                 self.income[turn, player], self.treasury[turn, player],
+                                 castles[turn, player], cities[turn, player]]
+                                + self.counts[turn, player].tolist())
+        logger.info("Статистика %d ходов записана в %s", self.turns, path)
+        return path
@@ -0,0 +1,260 @@
+"""Потоковый разбор файлов ходов (.svs).
+
+Формат файла:
+
+    л-Личное войско,г-Гном,...      легенда объектов
+    3                               номер хода
+    Player
+    Имя (Контакт) Страна
+    5 50 26333                      доход, казна, цвет (BGR)
+    З 32 16 160,                    тип, x, y, состояние
+    ...
+    END
+"""
+import io
+from array import array
+
+# Наибольшее значение в столбцах TurnObjects
+MAX_VALUE = 0xFFFF
+
+# Байты, по которым различаются кодировки кириллицы
+CP866_BYTES = bytes(range(0x80, 0xB0))  # А-Я, а-п в cp866
+CP1251_BYTES = bytes(range(0xC0, 0xE0)) + bytes(range(0xF0, 0x100))  # А-Я, р-я в cp1251
+ALL_BYTES = bytes(range(256))
+NOT_CP866 = bytes(b for b in ALL_BYTES if b not in CP866_BYTES)
+NOT_CP1251 = bytes(b for b in ALL_BYTES if b not in CP1251_BYTES)
+
+
+def detect_encoding(sample):
+    """Определяет кодировку по образцу текста (обычно строке легенды)"""
+    if max(sample, default=0) < 0x80:
+        return 'cp1251'
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    cp866_score = len(sample.translate(None, NOT_CP866))
+    cp1251_score = len(sample.translate(None, NOT_CP1251))
+    return 'cp866' if cp866_score > cp1251_score else 'cp1251'
+
+
+class PlayerRecord:
+    """Игрок хода; его объекты - срез [start, end) столбцов TurnObjects"""
+    __slots__ = ('name', 'contact', 'country', 'income', 'treasury', 'color', 'start', 'end')
+
+    def __init__(self, name='', contact='', country=''):
+        self.name = name
+        self.contact = contact
+        self.country = country
+        self.income = 0
+        self.treasury = 0
+        self.color = 0
+        self.start = 0
+        self.end = 0
+
+
+class ObjectRecord:
+    __slots__ = ('obj_type', 'x', 'y', 'state')
+
+    def __init__(self, obj_type, x, y, state):
+        self.obj_type = obj_type
+        self.x = x
+        self.y = y
+        self.state = state
+
+
+class TurnObjects:
+    """Объекты хода столбцами: код типа, координаты, состояние, номер владельца"""
+    __slots__ = ('types', 'xs', 'ys', 'states', 'owners')
+
+    def __init__(self):
+        self.types = array('H')  # ord() буквы типа
+        self.xs = array('H')
+        self.ys = array('H')
+        self.states = array('H')
+        self.owners = array('H')
+
+    def __len__(self):
+        return len(self.types)
+
+    def append(self, record, owner):
+        count = len(self.types)
+        try:
+            self.types.append(ord(record.obj_type))
+            self.xs.append(record.x)
+            self.ys.append(record.y)
+            self.states.append(record.state)
+            self.owners.append(owner)
+        except (OverflowError, TypeError):
+            # Столбцы не должны разойтись: откатываем уже добавленное
+            for name in self.__slots__:
+                del getattr(self, name)[count:]
+            raise
+
+    def type_at(self, index):
+        return chr(self.types[index])
+
+
+class ParsedTurn:
+    __slots__ = ('encoding', 'legend', 'turn', 'players', 'objects', 'warnings')
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.legend = {}  # буква типа -> название
+        self.turn = None
+        self.players = []  # PlayerRecord
+        self.objects = TurnObjects()
+        self.warnings = []  # (номер строки, сообщение)
+
+    def object_tuples(self, types=None):
+        """Объекты как кортежи (type, x, y, state, color) по игрокам в порядке файла"""
+        objects = self.objects
+        for player in self.players:
+            for i in range(player.start, player.end):
+                obj_type = chr(objects.types[i])
+                if types is None or obj_type in types:
+                    yield (obj_type, objects.xs[i], objects.ys[i], objects.states[i], player.color)
+
+
+def parse_legend(line):
+    legend = {}
+    for item in line.split(','):
+        code, sep, name = item.partition('-')
+        if sep and code.strip():
+            legend[code.strip()] = name.strip()
+    return legend
+
+
+def parse_player_name(line):
+    """'Имя (Контакт) Страна' -> PlayerRecord"""
+    name, sep, rest = line.partition(' (')
+    if sep:
+        contact, sep, country = rest.partition(') ')
+        if sep:
+            return PlayerRecord(name.strip(), contact.strip(), country.strip())
+    return PlayerRecord(line.strip())
+
+
+def iter_svs_records(stream, encoding=None, warnings=None):
+    """Один проход по бинарному потоку; выдает записи по мере чтения.
+
+    Первой выдается кодировка (str), затем dict легенды, номер хода (int),
+    PlayerRecord (с уже прочитанной строкой дохода, казны и цвета) и
+    ObjectRecord. Некорректные строки пропускаются с записью в warnings.
+    """
+    lines = iter(stream)
+    first = next(lines, b'')
+    if encoding is None:
+        encoding = detect_encoding(first)
+    yield encoding
+
+    # 0 - заголовок, 1 - имя игрока, 2 - доход/казна/цвет, 3 - объекты
+    stage = 0
+    player = None
+    line_number = 0
+    raw = first
+    while raw is not None:
+        line_number += 1
+        line = raw.decode(encoding, 'replace').strip().rstrip(',').strip()
+        raw = next(lines, None)
+        if not line:
+            continue
+        if line.startswith('END'):
+            break
+        if line.startswith('Player'):
+            if stage == 2:
+                yield player
+            stage = 1
+            continue
+        if stage == 0:
+            if line_number == 1 and '-' in line:
+                yield parse_legend(line)
+            elif line.isdigit():
+                yield int(line)
+            continue
+        if stage == 1:
+            player = parse_player_name(line)
+            stage = 2
+            continue
+
+        parts = line.split()
+        if stage == 2:
+            stage = 3
+            if parts[0].lstrip('-').isdigit():
+                try:
+                    player.income = int(parts[0])
+                    player.treasury = int(parts[1])
+                    player.color = int(parts[2])
+                except (ValueError, IndexError):
+                    if warnings is not None:
+                        warnings.append((line_number, f"Некорректная строка игрока '{line}'"))
+                yield player
+                continue
+            # Строки с доходом нет - сразу начались объекты
+            if warnings is not None:
+                warnings.append((line_number, f"Нет строки дохода и цвета у игрока {player.name}"))
+            yield player
+
+        if len(parts) >= 3:
+            try:
+                state = int(parts[3].rstrip(',')) if len(parts) > 3 else 0
+                x, y = int(parts[1]), int(parts[2])
+            except ValueError as e:
+                if warnings is not None:
+                    warnings.append((line_number, f"Ошибка разбора строки '{line}': {e}"))
+                continue
+            if len(parts[0]) != 1:
+                if warnings is not None:
+                    warnings.append((line_number, f"Тип объекта не из одной буквы '{line}'"))
+            elif not (0 <= x <= MAX_VALUE and 0 <= y <= MAX_VALUE and 0 <= state <= MAX_VALUE):
+                if warnings is not None:
+                    warnings.append((line_number, f"Значения вне допустимых '{line}'"))
+            else:
+                yield ObjectRecord(parts[0], x, y, state)
+        elif warnings is not None:
+            warnings.append((line_number, f"Слишком короткая строка объекта '{line}'"))
+
+    if stage == 2:
+        yield player
+
+
+def parse_svs(source, encoding=None):
+    """Разбирает файл хода (путь, bytes или бинарный поток) в ParsedTurn"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return parse_svs_stream(io.BytesIO(source), encoding)
+    if isinstance(source, str) or hasattr(source, '__fspath__'):
+        with open(source, 'rb') as stream:
+            return parse_svs_stream(stream, encoding)
+    return parse_svs_stream(source, encoding)
+
+
+def parse_svs_stream(stream, encoding=None):
+    warnings = []
+    records = iter_svs_records(stream, encoding, warnings)
+    turn = ParsedTurn(next(records))
+    turn.warnings = warnings
+    objects = turn.objects
+    owner = -1
+    for record in records:
+        if isinstance(record, ObjectRecord):
+            if owner < 0:
+                warnings.append((None, f"Объект {record.obj_type} до первого игрока пропущен"))
+                continue
+            try:
+                objects.append(record, owner)
+            except (OverflowError, TypeError):
+                warnings.append((None, f"Объект {record.obj_type} {record.x} {record.y} вне допустимых значений"))
+        elif isinstance(record, PlayerRecord):
+            if owner >= 0:
+                turn.players[owner].end = len(objects)
+            record.start = len(objects)
+            turn.players.append(record)
+            owner = len(turn.players) - 1
+        elif isinstance(record, dict):
+            turn.legend = record
+        elif isinstance(record, int):
+            turn.turn = record
+    if owner >= 0:
+        turn.players[owner].end = len(objects)
+    return turn
@@ -0,0 +1,111 @@
+"""Пирамида заранее уменьшенных копий карты, нарезанных на плитки.
+
+Уровень 0 - исходная канва, каждый следующий вдвое меньше предыдущего.
+Уровни строятся один раз, при первой отрисовке с увеличением: источник -
+общая с окном канва, поэтому строить их в другом потоке нельзя (pygame
+запрещает копирование из поверхности, заблокированной масштабированием).
+При отрисовке с масштабом scale берется самый мелкий уровень, который еще
+не меньше нужного, и масштабируются только видимые плитки. Уменьшенные
+плитки кэшируются до смены масштаба, поэтому перетаскивание карты почти не
+стоит масштабирования.
+"""
+import math
+from collections import OrderedDict
+
+import pygame
+
+
+class TilePyramid:
+    def __init__(self, source, tile_size=256, min_size=128, cache_tiles=512):
+        self.source = source
+        self.tile_size = tile_size
+        self.min_size = min_size
+        self.cache_tiles = cache_tiles
+        self.levels = []  # поверхности уровней, [0] - исходная канва
+        self.cache = OrderedDict()  # (уровень, i, j) -> уменьшенная плитка
+        self.cache_scale = None
+
+    def build(self):
+        """Строит уровни пирамиды"""
+        level = self.source
+        if level.get_bitsize() not in (24, 32):
+            converted = pygame.Surface(level.get_size(), depth=32)
+            converted.blit(level, (0, 0))
+            level = converted
+        levels = [level]
+        while min(level.get_size()) // 2 >= self.min_size:
+            level = pygame.transform.smoothscale(
+                level, (level.get_width() // 2, level.get_height() // 2))
+            levels.append(level)
+        self.levels = levels
+        return self
+
+    def choose_level(self, scale):
+        """Самый мелкий уровень, у которого пикселей на пиксель канвы не меньше scale"""
+        level = 0
+        while level + 1 < len(self.levels) and 0.5 ** (level + 1) >= scale:
+            level += 1
+        return level
+
+    def draw(self, surface, offset_x, offset_y, scale_x, scale_y, viewport):
+        """Рисует канву с масштабом scale и смещением offset в пределах viewport.
+
+        Экранная координата пикселя канвы px: offset_x + px * scale_x.
+        """
+        if not self.levels:
+            self.build()
+        level = self.choose_level(max(scale_x, scale_y))
+        image = self.levels[level]
+        # Масштаб относительно уровня: экранных пикселей на пиксель уровня
+        level_scale_x = self.source.get_width() / image.get_width()
+        level_scale_y = self.source.get_height() / image.get_height()
+        factor_x = scale_x * level_scale_x
+        factor_y = scale_y * level_scale_y
+        offset_x, offset_y = int(offset_x), int(offset_y)
+
+        if self.cache_scale != (level, factor_x, factor_y):
+            self.cache.clear()
+            self.cache_scale = (level, factor_x, factor_y)
+
+        # Видимая часть уровня в его пикселях
+        width, height = image.get_size()
+        u0 = max(0, math.floor((viewport.left - offset_x) / factor_x))
+        v0 = max(0, math.floor((viewport.top - offset_y) / factor_y))
+        u1 = min(width, math.ceil((viewport.right - offset_x) / factor_x))
+        v1 = min(height, math.ceil((viewport.bottom - offset_y) / factor_y))
+        if u0 >= u1 or v0 >= v1:
+            return
+
+        tile = self.tile_size
+        magnify = factor_x > 1 or factor_y > 1
+        blits = []
+        for j in range(v0 // tile, (v1 - 1) // tile + 1):
+            for i in range(u0 // tile, (u1 - 1) // tile + 1):
+                # При увеличении масштабируется только видимая часть плитки,
+                # при уменьшении - плитка целиком (и кэшируется)
+                if magnify:
+                    src = pygame.Rect(i * tile, j * tile, tile, tile).clip(
+                        pygame.Rect(u0, v0, u1 - u0, v1 - v0))
+                else:
+                    src = pygame.Rect(i * tile, j * tile, tile, tile).clip(image.get_rect())
+                # Границы считаются от координат уровня, поэтому соседние
+                # куски сходятся без щелей
+                left = math.floor(src.left * factor_x)
+                top = math.floor(src.top * factor_y)
+                size = (math.floor(src.right * factor_x) - left,
+                        math.floor(src.bottom * factor_y) - top)
+                if size[0] <= 0 or size[1] <= 0:
+                    continue
+                if magnify:
+                    scaled = pygame.transform.scale(image.subsurface(src), size)
+                else:
+                    scaled = self.cache.get((level, i, j))
+                    if scaled is None:
+                        scaled = pygame.transform.smoothscale(image.subsurface(src), size)
+                        self.cache[(level, i, j)] = scaled
+                        if len(self.cache) > self.cache_tiles:
+                            self.cache.popitem(last=False)
+                    else:
+                        self.cache.move_to_end((level, i, j))
+                blits.append((scaled, (offset_x + left, offset_y + top)))
+        surface.blits(blits, doreturn=False)
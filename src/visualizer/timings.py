@@ -0,0 +1,96 @@
+"""Замеры времени этапов отрисовки и загрузки прямо в просмотрщике.
+
+Каждый вызов размеченного метода добавляет одно число в кольцевой буфер
+этапа, поэтому накладные расходы - пара вызовов perf_counter. Процентили
+считаются только при показе или выгрузке.
+"""
+import functools
+import json
+import time
+from collections import deque
+
+import pygame
+
+PERCENTILES = (50, 95, 99)
+
+
+class StageTimings:
+    """Скользящие окна длительностей по этапам (в секундах)"""
+
+    def __init__(self, window=240):
+        self.window = window
+        self.samples = {}  # этап -> deque длительностей
+        self.counts = {}  # этап -> число вызовов за все время
+
+    def add(self, stage, duration):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = deque(maxlen=self.window)
+            self.counts[stage] = 0
+        samples.append(duration)
+        self.counts[stage] += 1
+
+    def percentiles(self, stage):
+        """{'p50': мс, 'p95': мс, 'p99': мс, 'max': мс} по текущему окну"""
+        ordered = sorted(self.samples.get(stage, ()))
+        if not ordered:
+            return {}
+        result = {}
+        for percent in PERCENTILES:
+            index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+            result[f'p{percent}'] = ordered[index] * 1000
+        result['max'] = ordered[-1] * 1000
+        return result
+
+    def summary(self):
+        return {stage: dict({key: round(value, 3) for key, value in self.percentiles(stage).items()},
+                            calls=self.counts[stage])
+                for stage in self.samples}
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'window': self.window, 'stages_ms': self.summary()},
+                      file, ensure_ascii=False, indent=2)
+
+
+def timed(stage):
+    """Декоратор метода: пишет длительность в self.timings, если он есть"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            timings = getattr(self, 'timings', None)
+            if timings is None:
+                return method(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                timings.add(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def draw_timings_hud(surface, timings, font, rect):
+    """Полупрозрачная таблица процентилей этапов поверх области rect"""
+    lines = [f"{'этап':<26}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}"]
+    for stage in timings.samples:
+        values = timings.percentiles(stage)
+        if values:
+            lines.append(f"{stage:<26}" + ''.join(
+                f"{values[key]:>8.2f}" for key in ('p50', 'p95', 'p99', 'max')))
+
+    texts = [font.render(line, True, (255, 255, 255)) for line in lines]
+    line_height = font.get_linesize()
+    width = max(text.get_width() for text in texts) + 10
+    height = line_height * len(texts) + 6
+    hud_rect = pygame.Rect(rect.right - width, rect.bottom - height, width, height).clip(rect)
+
+    background = pygame.Surface(hud_rect.size, pygame.SRCALPHA)
+    background.fill((0, 0, 0, 180))
+    surface.blit(background, hud_rect)
+    previous_clip = surface.get_clip()
+    surface.set_clip(hud_rect)
+    for number, text in enumerate(texts):
+        surface.blit(text, (hud_rect.x + 5, hud_rect.y + 3 + number * line_height))
+    surface.set_clip(previous_clip)
+    return hud_rect
@@ -0,0 +1,191 @@
+"""Восстановление путей войск между ходами.
+
+В сейвах нет идентификаторов войск, поэтому войска одного игрока и одного
+типа в соседних ходах сопоставляются назначением минимальной стоимости по
+расстоянию на сетке (Чебышёва: ход по диагонали - одна клетка). Войска,
+оставшиеся в своей клетке, сопоставляются сразу - для метрики это не
+ухудшает назначение; остальные решаются венгерским алгоритмом отдельно
+для каждой группы войск, которые могли дойти друг до друга. Пары дальше
+MAX_STEP клеток считаются не перемещением, а гибелью одного войска и
+появлением другого.
+
+Результат - номер строки-предшественника в истории для каждой строки
+нового хода (или NO_TRACK); TurnHistory хранит его столбцом рядом с
+координатами, поэтому при показе пути только собираются по ссылкам.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+NO_TRACK = -1
+MAX_STEP = 8
+
+
+def assign(cost):
+    """Назначение минимальной стоимости для матрицы n x m, n <= m.
+
+    Венгерский алгоритм с потенциалами (кратчайшие увеличивающие пути);
+    внутренний цикл по столбцам векторизован. Возвращает столбец для каждой строки.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # строка (с 1), назначенная столбцу
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(candidates.argmin()) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    result = np.full(n, NO_TRACK, dtype=np.int64)
+    columns = np.flatnonzero(p[1:])
+    result[p[1:][columns] - 1] = columns
+    return result
+
+
+def components(close):
+    """Связные компоненты двудольного графа close (строки x столбцы): [(строки, столбцы)]"""
+    row_seen = np.zeros(close.shape[0], dtype=bool)
+    result = []
+    for start in np.flatnonzero(close.any(axis=1)):
+        if row_seen[start]:
+            continue
+        rows = np.zeros(close.shape[0], dtype=bool)
+        rows[start] = True
+        cols = np.zeros(close.shape[1], dtype=bool)
+        while True:
+            new_cols = close[rows].any(axis=0) & ~cols
+            cols |= new_cols
+            new_rows = close[:, new_cols].any(axis=1) & ~rows
+            if not new_rows.any():
+                break
+            rows |= new_rows
+        row_seen |= rows
+        result.append((np.flatnonzero(rows), np.flatnonzero(cols)))
+    return result
+
+
+def match_group(old_xs, old_ys, new_xs, new_ys, max_step=MAX_STEP):
+    """Для каждого нового войска группы - индекс старого или NO_TRACK.
+
+    Каждому новому войску добавляется свой столбец "без пары" стоимостью
+    max_step + 1: тогда пары дальше max_step невыгодны и задача распадается
+    на независимые компоненты близких войск, которые решаются по отдельности.
+    """
+    result = np.full(len(new_xs), NO_TRACK, dtype=np.int64)
+    # Оставшиеся на месте
+    staying = defaultdict(list)
+    for index, cell in enumerate(zip(old_xs.tolist(), old_ys.tolist())):
+        staying[cell].append(index)
+    new_rest = []
+    for index, cell in enumerate(zip(new_xs.tolist(), new_ys.tolist())):
+        same_cell = staying.get(cell)
+        if same_cell:
+            result[index] = same_cell.pop()
+        else:
+            new_rest.append(index)
+    old_rest = [index for indices in staying.values() for index in indices]
+    if not new_rest or not old_rest:
+        return result
+
+    old_rest = np.array(old_rest)
+    new_rest = np.array(new_rest)
+    cost = np.maximum(np.abs(new_xs[new_rest, None] - old_xs[None, old_rest]),
+                      np.abs(new_ys[new_rest, None] - old_ys[None, old_rest]))
+    close = cost <= max_step
+    unmatched = max_step + 1
+    for rows, cols in components(close):
+        if len(rows) == 1 and len(cols) == 1:
+            result[new_rest[rows[0]]] = old_rest[cols[0]]
+            continue
+        # Строки - новые войска компоненты, столбцы - старые и по "без пары" на строку;
+        # недопустимые клетки дороже, чем оставить без пары все строки
+        forbidden = unmatched * (len(rows) + 1)
+        sub = np.full((len(rows), len(cols) + len(rows)), forbidden, dtype=np.float64)
+        sub[:, :len(cols)] = np.where(close[np.ix_(rows, cols)], cost[np.ix_(rows, cols)], forbidden)
+        np.fill_diagonal(sub[:, len(cols):], unmatched)
+        pairs = assign(sub)
+        matched = pairs < len(cols)
+        result[new_rest[rows[matched]]] = old_rest[cols[pairs[matched]]]
+    return result
+
+
+def match_armies(old, new, army_codes, max_step=MAX_STEP):
+    """Предшественники войск нового хода.
+
+    old и new - словари столбцов хода ('types', 'xs', 'ys', 'owners');
+    возвращается индекс строки old для каждой строки new или NO_TRACK.
+    """
+    result = np.full(len(new['types']), NO_TRACK, dtype=np.int64)
+    if not len(old['types']) or not len(new['types']):
+        return result
+    types = max(int(old['types'].max()), int(new['types'].max())) + 1
+    groups = {}
+    for side, columns in (('old', old), ('new', new)):
+        army = np.isin(columns['types'], army_codes)
+        keys = columns['owners'].astype(np.int64) * types + columns['types']
+        rows = np.flatnonzero(army)
+        order = rows[np.argsort(keys[rows], kind='stable')]
+        unique, starts = np.unique(keys[order], return_index=True)
+        for key, indices in zip(unique.tolist(), np.split(order, starts[1:])):
+            groups.setdefault(key, {})[side] = indices
+
+    for sides in groups.values():
+        if 'old' not in sides or 'new' not in sides:
+            continue
+        old_rows, new_rows = sides['old'], sides['new']
+        matched = match_group(old['xs'][old_rows].astype(np.int64), old['ys'][old_rows].astype(np.int64),
+                              new['xs'][new_rows].astype(np.int64), new['ys'][new_rows].astype(np.int64),
+                              max_step)
+        found = matched != NO_TRACK
+        result[new_rows[found]] = old_rows[matched[found]]
+    return result
+
+
+def trajectories(history, turn, length, owners=None):
+    """Пути войск хода turn не длиннее length ходов назад.
+
+    Возвращает (игроки, xs, ys): номер игрока партии для каждого пути и
+    массивы координат (length + 1, путей) от старых ходов к turn; где путь
+    короче, координаты - NaN. Войска без предшественника не возвращаются.
+    """
+    with history.lock:
+        if not history.has(turn):
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 0)), np.zeros((0, 0))
+        prev = history.objects['prev']
+        rows = np.arange(history.offsets[turn], history.offsets[turn + 1])
+        rows = rows[prev[rows] != NO_TRACK]
+        if owners is not None:
+            rows = rows[np.isin(history.objects['owners'][rows], list(owners))]
+        chain = [rows]
+        for _ in range(length):
+            current = chain[-1]
+            chain.append(np.where(current != NO_TRACK, prev[np.maximum(current, 0)], NO_TRACK))
+        chain = np.array(chain[::-1])
+        valid = chain != NO_TRACK
+        safe = np.maximum(chain, 0)
+        xs = np.where(valid, history.objects['xs'][safe], np.nan)
+        ys = np.where(valid, history.objects['ys'][safe], np.nan)
+        players = history.objects['owners'][rows].astype(np.int64)
+    return players, xs, ys
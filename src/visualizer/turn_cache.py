@@ -0,0 +1,162 @@
+import os
+import hashlib
+import json
+import logging
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TurnCache:
+    """Кэш разобранных ходов: в памяти и в бинарных файлах рядом с игрой.
+
+    Запись ключуется размером файла, временем изменения и хэшем содержимого.
+    Пока размер и время совпадают, файл хода даже не читается; если они
+    изменились, а содержимое осталось прежним (копирование, touch), запись
+    переиспользуется по хэшу. Иначе ход разбирается заново.
+
+    В памяти хранится не больше max_entries ходов (вытеснение LRU). Кэш
+    можно использовать из фоновых потоков.
+
+    На диске запись - сжатый JSON, а не pickle: каталоги игр передаются
+    между игроками, и файл кэша не должен уметь выполнить код. Объекты
+    хода - объекты игроков подряд (так их строит parse_turn_content),
+    поэтому отдельно они пишутся, только если это не так.
+    """
+
+    CACHE_DIR = '.vs25_cache'
+    MAGIC = b'VS25'
+    VERSION = 4
+    # magic, версия, размер файла, mtime в наносекундах, blake2b-хэш
+    HEADER = struct.Struct('<4sHqq16s')
+
+    def __init__(self, game_dir, parser, max_entries=64):
+        # parser(content: bytes) -> (objects, players, warnings)
+        self.parser = parser
+        self.cache_dir = os.path.join(game_dir, self.CACHE_DIR)
+        self.max_entries = max_entries
+        self.memory = OrderedDict()  # путь к файлу хода -> (size, mtime, digest, entry)
+        self.lock = threading.Lock()
+        self.disk_enabled = True
+
+    def get(self, turn_file):
+        """Возвращает (objects, players, warnings) для файла хода"""
+        stat = os.stat(turn_file)
+        size, mtime = stat.st_size, stat.st_mtime_ns
+
+        with self.lock:
+            cached = self.memory.get(turn_file)
+            if cached:
+                self.memory.move_to_end(turn_file)
+        if cached and cached[0] == size and cached[1] == mtime:
+            return cached[3]
+
+        disk_path = self.disk_path(turn_file)
+        header, payload = self.read_disk_entry(disk_path)
+        if header and header[0] == size and header[1] == mtime:
+            entry = self.decode_payload(payload)
+            if entry is not None:
+                self.remember(turn_file, (size, mtime, header[2], entry))
+                return entry
+
+        # Время изменения разошлось - сверяем содержимое по хэшу
+        with open(turn_file, 'rb') as file:
+            content = file.read()
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+
+        entry = None
+        if cached and cached[2] == digest:
+            entry = cached[3]
+        elif header and header[2] == digest:
+            entry = self.decode_payload(payload)
+
+        if entry is None:
+            entry = self.parser(content)
+
+        self.remember(turn_file, (size, mtime, digest, entry))
+        self.write_disk_entry(disk_path, size, mtime, digest, entry)
+        return entry
+
+    def remember(self, turn_file, record):
+        with self.lock:
+            self.memory[turn_file] = record
+            self.memory.move_to_end(turn_file)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def invalidate(self, turn_file):
+        """Удаляет запись о файле хода из памяти"""
+        with self.lock:
+            self.memory.pop(turn_file, None)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+
+    def disk_path(self, turn_file):
+        """Имя файла кэша не зависит от кодировки имени файла хода"""
+        name = os.path.basename(turn_file).encode('utf-8', 'surrogateescape')
+        return os.path.join(self.cache_dir, hashlib.md5(name).hexdigest() + '.turn')
+
+    def read_disk_entry(self, disk_path):
+        if not self.disk_enabled:
+            return None, None
+        try:
+            with open(disk_path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None, None
+        if len(data) < self.HEADER.size:
+            return None, None
+        magic, version, size, mtime, digest = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or version != self.VERSION:
+            return None, None
+        return (size, mtime, digest), data[self.HEADER.size:]
+
+    @staticmethod
+    def encode_entry(entry):
+        objects, players, warnings = entry
+        data = {'players': players, 'warnings': warnings}
+        if objects != [obj for player in players for obj in player.get('objects', [])]:
+            data['objects'] = objects
+        return json.dumps(data, ensure_ascii=True, separators=(',', ':')).encode('ascii')
+
+    @staticmethod
+    def decode_entry(data):
+        data = json.loads(data)
+        players = data['players']
+        for player in players:
+            player['objects'] = [tuple(obj) for obj in player.get('objects', [])]
+        if 'objects' in data:
+            objects = [tuple(obj) for obj in data['objects']]
+        else:
+            # Те же кортежи, что у игроков, - без второй копии в памяти
+            objects = [obj for player in players for obj in player['objects']]
+        return objects, players, [tuple(warning) for warning in data['warnings']]
+
+    def decode_payload(self, payload):
+        try:
+            return self.decode_entry(zlib.decompress(payload))
+        except (zlib.error, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def write_disk_entry(self, disk_path, size, mtime, digest, entry):
+        if not self.disk_enabled:
+            return
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, size, mtime, digest)
+        payload = zlib.compress(self.encode_entry(entry))
+        # Уникальное временное имя: запись может идти из нескольких потоков
+        tmp_path = f'{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                file.write(header)
+                file.write(payload)
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            # Каталог игры только для чтения - работаем с кэшем в памяти
+            logger.warning("Кэш ходов на диске отключен: %s", e)
+            self.disk_enabled = False
@@ -0,0 +1,135 @@
+from collections import namedtuple, defaultdict
+
+PlayerDiff = namedtuple('PlayerDiff', 'created destroyed moved flags_changed')
+
+
+class TurnDiff:
+    """Разница между двумя разобранными ходами.
+
+    players - словарь имя игрока -> PlayerDiff, где created и destroyed -
+    списки объектов, а moved и flags_changed - списки пар (старый, новый).
+    Объекты - кортежи (type, x, y, state, color), как их отдает разбор хода.
+    """
+
+    def __init__(self, players):
+        self.players = players
+
+    def __bool__(self):
+        return any(any(part) for part in self.players.values())
+
+    def created(self):
+        return [(name, obj) for name, diff in self.players.items() for obj in diff.created]
+
+    def destroyed(self):
+        return [(name, obj) for name, diff in self.players.items() for obj in diff.destroyed]
+
+    def moved(self):
+        return [(name, old, new) for name, diff in self.players.items() for old, new in diff.moved]
+
+    def flags_changed(self):
+        return [(name, old, new) for name, diff in self.players.items()
+                for old, new in diff.flags_changed]
+
+    def changed_cells(self):
+        """Клетки (x, y в игровых координатах), содержимое которых изменилось"""
+        cells = set()
+        for diff in self.players.values():
+            for obj in diff.created:
+                cells.add((obj[1], obj[2]))
+            for obj in diff.destroyed:
+                cells.add((obj[1], obj[2]))
+            for old, new in diff.moved:
+                cells.add((old[1], old[2]))
+                cells.add((new[1], new[2]))
+            for old, new in diff.flags_changed:
+                cells.add((new[1], new[2]))
+        return cells
+
+    def change_count(self):
+        return sum(len(diff.created) + len(diff.destroyed) + len(diff.moved) + len(diff.flags_changed)
+                   for diff in self.players.values())
+
+
+def group_objects(players):
+    """Игрок -> тип -> список объектов в порядке файла"""
+    grouped = defaultdict(lambda: defaultdict(list))
+    for player in players:
+        name = player.get('name', '')
+        for obj in player.get('objects', []):
+            grouped[name][obj[0]].append(obj)
+    return grouped
+
+
+def diff_objects(old_objects, new_objects, movable):
+    """Разница для объектов одного игрока и одного типа.
+
+    Сначала снимаются совпадающие объекты (та же клетка и состояние), затем
+    объекты, оставшиеся в той же клетке с другим состоянием. Оставшиеся
+    войска сопоставляются как перемещения в порядке следования в файле -
+    в сейвах нет идентификаторов войск. Все шаги линейны по числу объектов.
+    """
+    available = defaultdict(int)
+    for obj in new_objects:
+        available[(obj[1], obj[2], obj[3])] += 1
+
+    matched = defaultdict(int)
+    old_rest = []
+    for obj in old_objects:
+        key = (obj[1], obj[2], obj[3])
+        if available[key]:
+            available[key] -= 1
+            matched[key] += 1
+        else:
+            old_rest.append(obj)
+
+    # Новые объекты без точного совпадения, сгруппированные по клетке
+    new_by_cell = defaultdict(list)
+    for obj in new_objects:
+        key = (obj[1], obj[2], obj[3])
+        if matched[key]:
+            matched[key] -= 1
+        else:
+            new_by_cell[(obj[1], obj[2])].append(obj)
+
+    flags_changed = []
+    old_unmatched = []
+    for obj in old_rest:
+        same_cell = new_by_cell.get((obj[1], obj[2]))
+        if same_cell:
+            flags_changed.append((obj, same_cell.pop()))
+        else:
+            old_unmatched.append(obj)
+
+    new_unmatched = [obj for cell in new_by_cell.values() for obj in cell]
+
+    moved = []
+    if movable:
+        count = min(len(old_unmatched), len(new_unmatched))
+        moved = list(zip(old_unmatched[:count], new_unmatched[:count]))
+        old_unmatched = old_unmatched[count:]
+        new_unmatched = new_unmatched[count:]
+
+    return new_unmatched, old_unmatched, moved, flags_changed
+
+
+def diff_turns(old_players, new_players):
+    """Сравнивает два хода по спискам игроков, возвращает TurnDiff"""
+    old_grouped = group_objects(old_players)
+    new_grouped = group_objects(new_players)
+
+    players = {}
+    for name in list(old_grouped) + [name for name in new_grouped if name not in old_grouped]:
+        old_types = old_grouped.get(name, {})
+        new_types = new_grouped.get(name, {})
+        created, destroyed, moved, flags_changed = [], [], [], []
+        for obj_type in list(old_types) + [t for t in new_types if t not in old_types]:
+            # Войска обозначаются строчными буквами; строения не перемещаются
+            parts = diff_objects(old_types.get(obj_type, []), new_types.get(obj_type, []),
+                                 movable=obj_type.islower())
+            created.extend(parts[0])
+            destroyed.extend(parts[1])
+            moved.extend(parts[2])
+            flags_changed.extend(parts[3])
+        if created or destroyed or moved or flags_changed:
+            players[name] = PlayerDiff(created, destroyed, moved, flags_changed)
+    return TurnDiff(players)
@@ -0,0 +1,166 @@
+"""Слежение за файлами игровой директории.
+
+Оба наблюдателя отвечают на poll() множеством имен файлов, которые
+появились, изменились или исчезли с прошлого вызова, и ничего не ждут:
+poll() вызывается из цикла событий.
+
+    InotifyWatcher - Linux inotify через ctypes; о файле сообщается после
+                     закрытия записи или переименования в директорию.
+    PollingWatcher - сравнение размеров и времени изменения не чаще раза в
+                     interval секунд; о файле сообщается, когда его размер и
+                     время не менялись между двумя проходами (запись закончена).
+
+WatchThread опрашивает любой из них в фоновом потоке, копит изменения до
+следующего poll() и будит цикл событий через notify(), чтобы тот мог
+спать, пока ничего не происходит.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Флаги inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class PollingWatcher:
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self.snapshot = self.scan()
+        self.pending = {}  # имя -> состояние, замеченное на прошлом проходе
+        self.polled_at = time.monotonic()
+
+    def scan(self):
+        state = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        state[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            logger.warning("Не удалось прочитать %s: %s", self.directory, e)
+        return state
+
+    def poll(self):
+        now = time.monotonic()
+        if now - self.polled_at < self.interval:
+            return set()
+        self.polled_at = now
+
+        current = self.scan()
+        changed = set()
+        for name in set(current) | set(self.snapshot) | set(self.pending):
+            state = current.get(name)
+            if state == self.snapshot.get(name):
+                self.pending.pop(name, None)
+                continue
+            # Файл еще пишется - ждем, пока состояние перестанет меняться
+            if state is not None and self.pending.get(name) != state:
+                self.pending[name] = state
+                continue
+            self.pending.pop(name, None)
+            if state is None:
+                self.snapshot.pop(name, None)
+            else:
+                self.snapshot[name] = state
+            changed.add(name)
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+
+    def __init__(self, directory):
+        self.directory = directory
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch {directory}")
+
+    def poll(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if name:
+                    changed.add(os.fsdecode(name))
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class WatchThread:
+    def __init__(self, watcher, notify, interval=0.5):
+        self.watcher = watcher
+        self.notify = notify
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.changed = set()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='game-watch', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                changed = self.watcher.poll()
+            except OSError as e:
+                logger.warning("Слежение за %s: %s", self.watcher.directory, e)
+                continue
+            if changed:
+                with self.lock:
+                    self.changed |= changed
+                self.notify()
+
+    def poll(self):
+        """Изменения, накопленные с прошлого вызова"""
+        with self.lock:
+            changed, self.changed = self.changed, set()
+        return changed
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.watcher.close()
+
+
+def create_watcher(directory, interval=1.0, use_inotify=True):
+    """inotify, если он доступен, иначе опрос"""
+    if use_inotify and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            logger.debug("inotify недоступен, опрос директории: %s", e)
+    return PollingWatcher(directory, interval)